@@ -4,7 +4,15 @@
 
 import pickle
 import numpy as np
-import json
+import sys
+import os
+
+# simulator modules (results_store.py, json_export.py)
+SIMULATOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','simulator')
+sys.path.append(SIMULATOR_DIR)
+import results_store
+import json_export
+import aggregate
 
 
 WORK_on_topo = False
@@ -15,19 +23,23 @@ WORK_some_data = True
 
 EXPORT_DATA_TO_JSON = False
 EXPORT_DATA_TO_JSON = True
+JSON_LINES = False # one run per line in <start_time>_results.jsonl, instead of a JSON array
+
+STORE_QUERIES_DEMO = False # print a selection of runs from the run index, and the aggregates (mean, CI) of each cell
 
 # start dates of simulations
 times=['2023-05-24-15-20-32','2023-05-23-21-01-24','2023-05-24-14-11-32']
 
 for start_time in times:
 
-    data_CANL=pickle.load(open('{0}_data.dat'.format(start_time), 'rb'))
-    config_CANL=pickle.load(open('{0}_config.dat'.format(start_time), 'rb'))
-    topos_CANL=pickle.load(open('{0}_topos.dat'.format(start_time), 'rb'))
+    # the first opening indexes the pickles once into <start_time>_store and <start_time>_topos/ (see results_store.py),
+    # then runs, fields and topologies are read only when requested
+    data_CANL=results_store.LazyResults(start_time)
+    config_CANL=data_CANL.config
 
     if WORK_on_topo:
-        for repe in topos_CANL: # simulations are repeated independently over a given number of topologies
-            topo=topos_CANL[repe]
+        for repe in data_CANL.topo_ids(): # simulations are repeated independently over a given number of topologies
+            topo=data_CANL.topo(repe)
             print(topo.keys())
 
             devices=topo["nodes"]
@@ -67,6 +79,15 @@ for start_time in times:
         else: # otherwise compare different protocols
             protos_list=[proto for proto in protos]
 
+        if STORE_QUERIES_DEMO:
+            # runs can be found from their params in the run index of the store, without replaying the loops below
+            # (params named as in lorasim3: avgSendTime, nrNodes, topo_scale, n_retry, dist_min/max_payload_size, rayleigh_mean_dB, gamma_ED, topo, and proto)
+            some_runs=data_CANL.select(proto=protos_list[0],topo_scale=scales[0])
+            print(data_CANL.columns(["params.avgSendTime","TOTAL.DER"],runs=some_runs))
+
+            # mean and 95% CI over the repetitions of DER, PDR, energy_per_success, mean_success_latency, per protocol and inter-packet time
+            print(aggregate.aggregate(data_CANL.store_dir,group_by=["proto","avgSendTime"]))
+
         data_index=0
 
         nnodes=n_Nodes_tab[0]
@@ -84,17 +105,23 @@ for start_time in times:
                                     for proto in protos_list:
 
                                         # here in the scope of a single independant simulation run
-                                        print(data_CANL[data_index]["TOTAL"].keys())
-                                        print(data_CANL[data_index]["nodes"][18].keys())
+                                        # data_CANL.run(data_index,fields=["TOTAL.DER"]) reads only what is listed
+                                        run=data_CANL.run(data_index)
+                                        print(run["TOTAL"].keys())
+                                        print(run["nodes"][18].keys())
                                         print(0/0)
                                         # do something
 
                                         data_index+=1
         # save changes ?
         if False:
-            pickle.dump(data_CANL, open('{0}_data.dat'.format(start_time), 'wb'))
+            with open('{0}_data.dat'.format(start_time), 'wb') as data_file:
+                pickle.dump([data_CANL.res(run_id) for run_id in range(len(data_CANL))], data_file)
 
     if EXPORT_DATA_TO_JSON:
-        json_dict = json.dumps(data_CANL, indent=4)
-        with open('{0}_results.json'.format(start_time), "w") as outfile:
-            outfile.write(json_dict)
+        # runs are read and written one at a time, as the res dicts of the _data.dat file
+        runs=(data_CANL.res(run_id) for run_id in range(len(data_CANL)))
+        if JSON_LINES:
+            json_export.export_jsonl(runs, '{0}_results.jsonl'.format(start_time))
+        else:
+            json_export.export_json(runs, '{0}_results.json'.format(start_time))
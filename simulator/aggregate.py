@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+######################### Aggregation of results for the LoRaSim3 Simulator ##################
+######################### https://github.com/Guillaumegaillard/CANL-LoRa #####################
+######################### unguaranteed public version ########################################
+
+# Mean and confidence interval of TOTAL metrics over the repetitions of each cell of a sweep,
+# computed from a results store (see results_store.py):
+## aggregate(store_dir,group_by=["proto","avgSendTime"]) returns a table (numpy structured array),
+## one row per group: the group params, then per metric <metric>_n, <metric>_mean, <metric>_std, <metric>_ci
+## (half width of the interval: mean +/- ci)
+# Groups come from the run index, metrics are read chunk by chunk and reduced per group with bincount,
+# the partial (n, mean, M2) of the chunks being merged with Chan's formula, so memory does not grow with the sweep.
+# Values that are no value are left out: NaN and absent ones, and the -1 lorasim3 gives the ratios undefined for a run
+# (e.g. a mean success latency or an energy per success with no success, see NO_VALUE_METRICS).
+
+import numpy as np
+
+import results_store
+
+try:
+    from scipy import stats
+except ImportError:
+    stats = None
+
+
+DEFAULT_METRICS=["DER","PDR","energy_per_success","mean_success_latency"]
+
+# TOTAL metrics set to NO_VALUE by lorasim3 when undefined (nothing sent, no success), -1 being no actual value of theirs
+NO_VALUE=-1
+NO_VALUE_METRICS=["DER","DER_method_2","mean_latency","mean_success_latency","energy_per_success"]
+
+# params that are not sweep cells: repetitions and bookkeeping of the run index
+NOT_GROUPED=["run","chunk","row","topo","seed"]
+
+# two-sided Student t quantiles, by confidence then degrees of freedom (used when scipy is missing)
+T_TABLE_DF=np.array([1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,25,30,40,60,120])
+T_TABLE={
+    .90:[6.314,2.920,2.353,2.132,2.015,1.943,1.895,1.860,1.833,1.812,1.796,1.782,1.771,1.761,1.753,1.746,1.740,1.734,1.729,1.725,1.708,1.697,1.684,1.671,1.658],
+    .95:[12.706,4.303,3.182,2.776,2.571,2.447,2.365,2.306,2.262,2.228,2.201,2.179,2.160,2.145,2.131,2.120,2.110,2.101,2.093,2.086,2.060,2.042,2.021,2.000,1.980],
+    .99:[63.657,9.925,5.841,4.604,4.032,3.707,3.499,3.355,3.250,3.169,3.106,3.055,3.012,2.977,2.947,2.921,2.898,2.878,2.861,2.845,2.787,2.750,2.704,2.660,2.617],
+    }
+
+
+# two-sided quantiles of Student t for an array of degrees of freedom (>=1)
+def t_quantile(confidence,df):
+    df=np.asarray(df)
+    if stats is not None:
+        return stats.t.ppf(.5+confidence/2,df)
+    if confidence not in T_TABLE:
+        raise ValueError("confidence {0} needs scipy, without it use one of {1}".format(confidence,sorted(T_TABLE)))
+    # conservative: the tabulated df just below (120 beyond)
+    position=np.searchsorted(T_TABLE_DF,df,side='right')-1
+    return np.array(T_TABLE[confidence])[np.clip(position,0,len(T_TABLE_DF)-1)]
+
+
+# merge partial statistics per group (arrays), Chan's formula
+def merge_group_stats(n_a,mean_a,M2_a,n_b,mean_b,M2_b):
+    n=n_a+n_b
+    safe_n=np.maximum(n,1)
+    delta=mean_b-mean_a
+    return n,mean_a+delta*n_b/safe_n,M2_a+M2_b+delta*delta*n_a*n_b/safe_n
+
+
+def aggregate(store_dir,group_by=None,metrics=DEFAULT_METRICS,confidence=.95,runs=None):
+    run_index=results_store.load_run_index(store_dir)
+    if group_by is None:
+        group_by=[name for name in run_index.dtype.names if name not in NOT_GROUPED]
+    if runs is not None:
+        run_index=run_index[np.isin(run_index["run"],runs)]
+
+    # group of each run
+    if len(group_by)>0:
+        groups,group_of_row=np.unique(run_index[group_by],return_inverse=True)
+    else:
+        groups,group_of_row=np.zeros(1,dtype=[]),np.zeros(len(run_index),dtype=np.int64)
+    group_of_run=np.full(run_index["run"].max()+1 if len(run_index)>0 else 0,-1,dtype=np.int64)
+    group_of_run[run_index["run"]]=group_of_row.ravel()
+    n_groups=len(groups)
+
+    acc={metric:[np.zeros(n_groups),np.zeros(n_groups),np.zeros(n_groups)] for metric in metrics}
+    for part in results_store.iter_chunks(store_dir,["TOTAL."+metric for metric in metrics]):
+        in_index=part["run"]<len(group_of_run)
+        group=np.full(len(part["run"]),-1,dtype=np.int64)
+        group[in_index]=group_of_run[part["run"][in_index]]
+        for metric in metrics:
+            if "TOTAL."+metric not in part:
+                continue
+            values=part["TOTAL."+metric].astype(np.float64)
+            keep=(group>=0)&~np.isnan(values)
+            if metric in NO_VALUE_METRICS:
+                keep&=values!=NO_VALUE
+            g,x=group[keep],values[keep]
+            n=np.bincount(g,minlength=n_groups).astype(np.float64)
+            mean=np.bincount(g,x,minlength=n_groups)/np.maximum(n,1)
+            M2=np.bincount(g,(x-mean[g])**2,minlength=n_groups)
+            acc[metric]=merge_group_stats(*acc[metric],n,mean,M2)
+
+    # tidy table
+    fields=[(name,groups.dtype[name]) for name in group_by]
+    for metric in metrics:
+        fields+=[(metric+"_n","i8"),(metric+"_mean","f8"),(metric+"_std","f8"),(metric+"_ci","f8")]
+    table=np.zeros(n_groups,dtype=fields)
+    for name in group_by:
+        table[name]=groups[name]
+    for metric in metrics:
+        n,mean,M2=acc[metric]
+        with np.errstate(invalid='ignore',divide='ignore'):
+            std=np.where(n>1,np.sqrt(M2/np.maximum(n-1,1)),np.nan)
+            ci=np.where(n>1,t_quantile(confidence,np.maximum(n-1,1))*std/np.sqrt(n),np.nan)
+        table[metric+"_n"]=n
+        table[metric+"_mean"]=np.where(n>0,mean,np.nan)
+        table[metric+"_std"]=std
+        table[metric+"_ci"]=ci
+    return table
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+######################### Benchmarks of the LoRaSim3 Simulator ###############################
+######################### https://github.com/Guillaumegaillard/CANL-LoRa #####################
+######################### unguaranteed public version ########################################
+
+# Wall times of the simulator, seeded, to compare versions of the code on a same machine:
+## end to end: main_with_params for each protocol, number of devices and load (avgSendTime),
+##             on the first devices of one nested topology (see nested_counts in topo_builder.build_topo)
+## micro:      per call times of hot functions (checkcollision, start_listening, stop_listening, repropagate,
+##             airtime, build_dist_mat), in the state left by a seeded CANL22 run, with some devices on air
+# Results are written as JSON (results/benchmark_<start_time>.json), with the machine and a hash of the simulator
+# sources (see run_cache.code_hash). Runs are shortened to packets_per_node scheduled packets per device.
+# Edit the settings at the end and run:
+## python benchmark.py [output.json]
+
+import platform
+import sys
+import time
+import timeit
+
+import numpy as np
+import simpy
+
+import lorasim3
+import topo_builder
+import sweep
+import run_cache
+import json_export
+
+
+# protocols of the end to end runs (names of sweep.PROTOCOLS)
+PROTOCOLS=["CANL22","ideal_FIFO","CAD+Backoff"]
+
+
+def machine_info():
+    return {
+        "platform":platform.platform(),
+        "processor":platform.processor(),
+        "python":platform.python_version(),
+        "numpy":np.__version__,
+        "simpy":simpy.__version__,
+        "code_hash":run_cache.code_hash(),
+        }
+
+
+# params of a benchmark run
+def bench_params(topo,n_nodes,avg_send_time,proto,experiment,packets_per_node,seed):
+    params=dict(sweep.BASE_PARAMS)
+    params.update({
+        "start_time":"benchmark",
+        "log_events":False,
+        "experiment":experiment,
+        "var_CAD_prob":True,
+        "CAD_prob":100,
+        "full_distances":True,
+        "topo":topo,
+        "topo_scale":1,
+        "nrNodes":n_nodes,
+        "avgSendTime":avg_send_time,
+        "packets_per_node":packets_per_node,
+        "seed":seed,
+        })
+    params.update(sweep.protocol_params(proto))
+    return params
+
+
+# best and mean per call times of a function, over *repeat* series of *number* calls
+def time_calls(call,number,repeat):
+    times=np.array(timeit.repeat(call,number=number,repeat=repeat))/number
+    return {"number":number,"repeat":repeat,"best_s":times.min(),"mean_s":times.mean()}
+
+
+def end_to_end(topo,n_nodes_tab,avg_send_times,protocols,experiment,packets_per_node,seed):
+    results=[]
+    for n_nodes in n_nodes_tab:
+        for avg_send_time in avg_send_times:
+            for proto in protocols:
+                params=bench_params(topo,n_nodes,avg_send_time,proto,experiment,packets_per_node,seed)
+                start=time.perf_counter()
+                res=lorasim3.main_with_params(params)
+                wall=time.perf_counter()-start
+                results.append({
+                    "proto":proto,
+                    "nrNodes":n_nodes,
+                    "avgSendTime":avg_send_time,
+                    "wall_s":wall,
+                    "simulated_ms":res["TOTAL"]["end_simulation_time"],
+                    "DER":res["TOTAL"]["DER"],
+                    })
+                print("{0} N={1} avgSendTime={2}: {3:.2f} s".format(proto,n_nodes,avg_send_time,wall),file=lorasim3.stdout_print_target)
+    return results
+
+
+# the hot functions, in the state of the simulator after a seeded CANL22 run of n_nodes devices,
+# the packets of the *on_air* first devices being on air
+def micro(topo,n_nodes,on_air,experiment,packets_per_node,seed,number,repeat):
+    lorasim3.main_with_params(bench_params(topo,n_nodes,1500000,"CANL22",experiment,packets_per_node,seed))
+    nodes=lorasim3.nodes
+    listener=nodes[on_air]
+    packet=listener.packet
+    lorasim3.packetsOnAir=nodes[:on_air]
+
+    def listen():
+        listener.heard_frames=[]
+        listener.start_listening()
+
+    def listen_and_stop():
+        listen()
+        listener.ca_listen_start_time=lorasim3.env.now-packet.Tpream
+        listener.add_rx_time_opportunities=1
+        listener.stop_listening()
+
+    def collision():
+        packet.collided=0
+        lorasim3.checkcollision(packet)
+
+    results={
+        "checkcollision":time_calls(collision,number,repeat),
+        "start_listening":time_calls(listen,number,repeat),
+        "start_listening+stop_listening":time_calls(listen_and_stop,number,repeat),
+        "repropagate":time_calls(packet.repropagate,number,repeat),
+        "airtime":time_calls(lambda:lorasim3.airtime(packet.sf,packet.cr,packet.pl,packet.bw),number,repeat),
+        "build_dist_mat":time_calls(lambda:lorasim3.build_dist_mat(topo,n_nodes),1,repeat),
+        }
+    # heard frames appended to the listening devices by checkcollision
+    for node in nodes:
+        node.heard_frames=[]
+    lorasim3.packetsOnAir=[]
+    for name in results:
+        results[name].update({"nrNodes":n_nodes,"on_air":on_air})
+        print("{0} N={1}: {2:.3g} s/call".format(name,n_nodes,results[name]["best_s"]),file=lorasim3.stdout_print_target)
+    return results
+
+
+def run_benchmark(settings,path=None):
+    if path is None:
+        path='results/benchmark_{0}.json'.format(time.strftime("%Y-%m-%d-%H-%M-%S", time.localtime()))
+    # the runs of k devices use the first k devices of one topology
+    topo=topo_builder.build_topo(max(settings["n_Nodes_tab"]),settings["experiment"],settings["maxDist_dev_gw"],
+        seed=settings["seed"],nested_counts=settings["n_Nodes_tab"])
+    report={
+        "machine":machine_info(),
+        "settings":settings,
+        "end_to_end":end_to_end(topo,settings["n_Nodes_tab"],settings["tpkts"],settings["protos"],
+            settings["experiment"],settings["packets_per_node"],settings["seed"]),
+        "micro":{n_nodes:micro(topo,n_nodes,settings["micro_on_air"],settings["experiment"],settings["packets_per_node"],
+            settings["seed"],settings["micro_number"],settings["micro_repeat"]) for n_nodes in settings["n_Nodes_tab"]},
+        }
+    json_export.dump(report,path)
+    return report
+
+
+if __name__ == '__main__':
+
+    settings={
+        "seed":1,
+        "experiment":4,
+        "maxDist_dev_gw":0,
+        "n_Nodes_tab":[50,200,1000,5000],
+        "tpkts":[1500000,150000,60000],
+        "protos":PROTOCOLS,
+        "packets_per_node":20,
+        "micro_on_air":8,
+        "micro_number":200,
+        "micro_repeat":5,
+    }
+
+    run_benchmark(settings,sys.argv[1] if len(sys.argv)>1 else None)
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+######################### Event traces for the LoRaSim3 Simulator ############################
+######################### https://github.com/Guillaumegaillard/CANL-LoRa #####################
+######################### unguaranteed public version ########################################
+
+# When log_events is set, the simulator records node level events (collisions, receptions, CAD results,
+# TX and listen periods) as fixed-width binary records, buffered in a numpy array and flushed as
+# successive .npy shards in a trace directory:
+##   <trace_dir>/meta.json          start time and table of event codes
+##   <trace_dir>/shard_00000.npy    records, in the order they were produced
+##   <trace_dir>/index.npy          time index, one line per shard (see index_dtype)
+# read_trace() decodes them back to the tuples of the former text log, e.g.
+##   ("GW","col",tx_id,collided_id,time)   (node_id,"rx",tx_id,time)   (node_id,"TX_start",time)
+# Records can be restricted to some nodes (node field, GW_ID for the gateway) and/or some event names;
+# these filters are precomputed as lookup tables checked before anything is written.
+# Restriction to time windows is done by the simulator, which switches log_events on and off.
+# extract_timeline() uses the index to read only the shards of a time window (and the former ones, backwards,
+# for the intervals open at its start) and returns per node TX/listen/NAV/CAD intervals, for timeline plots.
+
+import numpy as np
+import json
+import glob
+import os
+
+
+# event codes
+COL=0               # a collision, seen at a receiver: (receiver,"col",transmitter,collided)
+RX=1                # a reception at a receiver: (receiver,"rx",transmitter)
+CAD_POS=2
+CAD_NEG=3
+TX_START=4
+TX_STOP=5
+LIS1_START=6
+LIS1_STOP=7
+LIS2_START=8
+LIS2_STOP=9
+NAV_START=10
+NAV_STOP=11
+CAD_START=12        # a CAD ends with CAD+ or CAD-
+
+EVENT_NAMES=["col","rx","CAD+","CAD-","TX_start","TX_stop","lis1_start","lis1_stop","lis2_start","lis2_stop","NAV_start","NAV_stop","CAD_start"]
+
+# kinds of intervals of a timeline: (start codes, stop codes)
+TIMELINE_KINDS={
+    "TX":([TX_START],[TX_STOP]),
+    "listen":([LIS1_START,LIS2_START],[LIS1_STOP,LIS2_STOP]),
+    "NAV":([NAV_START],[NAV_STOP]),
+    "CAD":([CAD_START],[CAD_POS,CAD_NEG]),
+    }
+
+# event code -> index of its kind in TIMELINE_KINDS (-1 for none), whether it starts an interval
+KIND_OF_EVENT=np.full(len(EVENT_NAMES),-1,dtype=np.int64)
+STARTS_INTERVAL=np.zeros(len(EVENT_NAMES),dtype=bool)
+for kind_i,(start_codes,stop_codes) in enumerate(TIMELINE_KINDS.values()):
+    KIND_OF_EVENT[start_codes+stop_codes]=kind_i
+    STARTS_INTERVAL[start_codes]=True
+
+GW_ID=-1            # the gateway as a receiver
+NO_NODE=-2          # unused node field
+
+record_dtype=np.dtype([
+    ("time","f8"),      # simulated time, ms
+    ("node","i4"),      # node the event is about (receiver for col/rx), GW_ID for the gateway
+    ("event","i1"),
+    ("other","i4"),     # transmitter for col/rx
+    ("collided","i4"),  # collided transmission for col
+    ])
+
+# records of a shard are produced in simulated time order, except listen stops dated back to the
+# actual end of listening, hence shards may overlap a little: the index keeps the time range of each
+# shard, and the running max of t_max / the min of t_min over the next shards, both non decreasing,
+# so that the shards of a window are found by two binary searches
+index_dtype=np.dtype([
+    ("t_min","f8"),
+    ("t_max","f8"),
+    ("count","i8"),
+    ("t_max_upto","f8"),    # max of t_max over shards 0..i
+    ("t_min_from","f8"),    # min of t_min over shards i..end
+    ])
+
+
+class EventTrace():
+    # records are buffered *buffer_size* at a time, then written as a shard
+    # n_nodes: number of devices, nodes: ids to keep (None for all), events: names to keep (None for all)
+    def __init__(self,trace_dir,start_time,buffer_size=65536,n_nodes=0,nodes=None,events=None,windows=None):
+        self.trace_dir=trace_dir
+        if not os.path.exists(trace_dir):
+            os.makedirs(trace_dir)
+        # files of a former trace (meta.json is rewritten): a stale index would point to its shards
+        for old_file in glob.glob(os.path.join(trace_dir,"shard_*.npy"))+glob.glob(os.path.join(trace_dir,"index.npy")):
+            os.remove(old_file)
+
+        with open(os.path.join(trace_dir,"meta.json"),"w") as meta_file:
+            json.dump({
+                "start_time":start_time,"events":EVENT_NAMES,"gw_id":GW_ID,"no_node":NO_NODE,
+                "filters":{
+                    "nodes":sorted(nodes) if nodes is not None else None,
+                    "events":sorted(events) if events is not None else None,
+                    "windows":[list(w) for w in windows] if windows is not None else None,
+                    },
+                },meta_file)
+
+        # lookup tables, node GW_ID (-1) is the last slot
+        if nodes is None:
+            self.node_mask=[True]*(n_nodes+1)
+        else:
+            self.node_mask=[False]*(n_nodes+1)
+            for node in nodes:
+                self.node_mask[node]=True
+        if events is None:
+            self.event_mask=[True]*len(EVENT_NAMES)
+        else:
+            self.event_mask=[name in events for name in EVENT_NAMES]
+
+        self.buffer=np.empty(buffer_size,dtype=record_dtype)
+        self.n_records=0
+        self.n_shards=0
+        self.index=[]
+
+    def record(self,time,node,event,other=NO_NODE,collided=NO_NODE):
+        if not (self.event_mask[event] and self.node_mask[node]):
+            return
+        if self.n_records==len(self.buffer):
+            self.flush()
+        self.buffer[self.n_records]=(time,node,event,other,collided)
+        self.n_records+=1
+
+    def flush(self):
+        if self.n_records>0:
+            times=self.buffer["time"][:self.n_records]
+            np.save(os.path.join(self.trace_dir,"shard_{0:05d}.npy".format(self.n_shards)),self.buffer[:self.n_records])
+            self.index.append((times.min(),times.max(),self.n_records))
+            self.n_shards+=1
+            self.n_records=0
+            self.write_index()
+
+    # rewritten at each flush, so that a trace cut by a crash is still indexed
+    def write_index(self):
+        index=np.zeros(len(self.index),dtype=index_dtype)
+        index["t_min"],index["t_max"],index["count"]=zip(*self.index)
+        index["t_max_upto"]=np.maximum.accumulate(index["t_max"])
+        index["t_min_from"]=np.minimum.accumulate(index["t_min"][::-1])[::-1]
+        np.save(os.path.join(self.trace_dir,"index.npy"),index)
+
+    def close(self):
+        self.flush()
+
+
+# all the records of a trace, as one structured array
+def load_records(trace_dir):
+    shards=sorted(glob.glob(os.path.join(trace_dir,"shard_*.npy")))
+    if len(shards)==0:
+        return np.empty(0,dtype=record_dtype)
+    return np.concatenate([np.load(shard) for shard in shards])
+
+
+# back to the tuples of the former text log
+def decode(records,event_names=EVENT_NAMES):
+    decoded=[]
+    for time,node,event,other,collided in records.tolist():
+        node="GW" if node==GW_ID else node
+        if event==COL:
+            decoded.append((node,event_names[event],other,collided,time))
+        elif event==RX:
+            decoded.append((node,event_names[event],other,time))
+        else:
+            decoded.append((node,event_names[event],time))
+    return decoded
+
+
+def read_trace(trace_dir):
+    with open(os.path.join(trace_dir,"meta.json")) as meta_file:
+        meta=json.load(meta_file)
+    return decode(load_records(trace_dir),meta["events"])
+
+
+def load_index(trace_dir):
+    index_path=os.path.join(trace_dir,"index.npy")
+    if not os.path.exists(index_path):
+        return np.zeros(0,dtype=index_dtype)
+    return np.load(index_path,mmap_mode='r')
+
+
+# shards [first,last) that may hold records dated within [t0,t1]
+def find_shards(index,t0,t1):
+    first=np.searchsorted(index["t_max_upto"],t0,side='left')
+    last=np.searchsorted(index["t_min_from"],t1,side='right')
+    return first,max(first,last)
+
+
+# records dated within [t0,t1], of the given nodes (None for all), in the order they were produced
+def load_window(trace_dir,t0,t1,nodes=None):
+    first,last=find_shards(load_index(trace_dir),t0,t1)
+    parts=[]
+    for shard_i in range(first,last):
+        shard=np.load(os.path.join(trace_dir,"shard_{0:05d}.npy".format(shard_i)),mmap_mode='r')
+        keep=(shard["time"]>=t0)&(shard["time"]<=t1)
+        if nodes is not None:
+            keep&=np.isin(shard["node"],list(nodes))
+        parts.append(shard[keep])
+    if len(parts)==0:
+        return np.empty(0,dtype=record_dtype)
+    return np.concatenate(parts)
+
+
+# intervals of each node and kind open at t0, started before: {(node,kind):start time}
+## from the last start/stop record dated before t0 of each node and kind, the shards before t0 being read backwards
+## until every node of *nodes* (None for all, then all of them are read) has one of each kind
+def open_intervals(trace_dir,index,t0,nodes=None):
+    last=np.searchsorted(index["t_min_from"],t0,side='left')
+    kind_names=list(TIMELINE_KINDS)
+    latest={}
+    for shard_i in range(last-1,-1,-1):
+        # records of the former shards are dated before any state found, except overlaps (see index_dtype)
+        if (nodes is not None and len(latest)==len(set(nodes))*len(kind_names)
+                and index["t_max_upto"][shard_i]<min(time for time,starts in latest.values())):
+            break
+        shard=np.load(os.path.join(trace_dir,"shard_{0:05d}.npy".format(shard_i)),mmap_mode='r')
+        keep=(shard["time"]<t0)&(KIND_OF_EVENT[shard["event"]]>=0)
+        if nodes is not None:
+            keep&=np.isin(shard["node"],list(nodes))
+        rows=np.flatnonzero(keep)
+        if len(rows)==0:
+            continue
+        times,shard_nodes,events=shard["time"][rows],shard["node"][rows],shard["event"][rows]
+        kinds=KIND_OF_EVENT[events]
+        # last record of each node and kind: by time, then production order
+        order=np.lexsort((rows,times,kinds,shard_nodes))
+        is_last=np.append((np.diff(shard_nodes[order])!=0)|(np.diff(kinds[order])!=0),True)
+        for i in order[is_last].tolist():
+            key=(int(shard_nodes[i]),kind_names[kinds[i]])
+            # a later shard wins ties
+            if key not in latest or times[i]>latest[key][0]:
+                latest[key]=(float(times[i]),bool(STARTS_INTERVAL[events[i]]))
+    return {key:time for key,(time,starts) in latest.items() if starts}
+
+
+# per node intervals within [t0,t1]: {node:{kind:array of shape (n,2) of (start,stop)}}, kinds of TIMELINE_KINDS
+# intervals crossing the window bounds (e.g. a TX spanning the whole window) are clipped to them
+def extract_timeline(trace_dir,t0,t1,nodes=None):
+    records=load_window(trace_dir,t0,t1,nodes)
+    opened=open_intervals(trace_dir,load_index(trace_dir),t0,nodes)
+    timeline={}
+    for node in sorted(set(np.unique(records["node"]).tolist())|set(node for node,kind in opened)):
+        node_records=records[records["node"]==node]
+        node_timeline={}
+        for kind,(start_codes,stop_codes) in TIMELINE_KINDS.items():
+            is_start=np.isin(node_records["event"],start_codes)
+            is_stop=np.isin(node_records["event"],stop_codes)
+            times=node_records["time"][is_start|is_stop]
+            starts=is_start[is_start|is_stop]
+            # intervals of a node of a kind do not overlap: sorted, starts and stops alternate
+            order=np.argsort(times,kind='stable')
+            times,starts=times[order],starts[order]
+            if (len(times)>0 and not starts[0]) or (len(times)==0 and (node,kind) in opened):
+                times,starts=np.append(t0,times),np.append(True,starts)
+            if len(times)>0 and starts[-1]:
+                times,starts=np.append(times,t1),np.append(starts,False)
+            node_timeline[kind]=np.column_stack((times[starts],times[~starts]))
+        timeline["GW" if node==GW_ID else node]=node_timeline
+    return timeline
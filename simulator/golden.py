@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+######################### Golden outputs of the LoRaSim3 Simulator ###########################
+######################### https://github.com/Guillaumegaillard/CANL-LoRa #####################
+######################### unguaranteed public version ########################################
+
+# Equivalence check of a version of the simulator (e.g. an optimization) against recorded outputs:
+## record:  run a fixed set of seeded scenarios (experiments x full_distances x protocols, CANL22 variants included)
+##          and store res["TOTAL"] and res["nodes"] of each, with its params and topology, in <golden_dir>/<scenario>.json
+## compare: run the recorded params again, on the recorded topology (a topology dict in params["topo"], see
+##          topo_builder.get_topo), compare with the golden outputs, exactly (default) or within tolerances, and list the differences
+# python golden.py record [golden_dir]
+# python golden.py compare [golden_dir] [rtol]
+# The exit status of compare is 1 if an output moved.
+# Tolerances: {"<path or field name>":{"rtol":..,"atol":..}}, e.g. {"TOTAL.DER":{"rtol":1e-9},"mean_latency":{"atol":1e-6}},
+# a path being as "TOTAL.DER" or "nodes.3.DER": the longest matching path applies, then the field name,
+# then "TOTAL" or "nodes" (as the rtol of compare), then the default (exact).
+
+import json
+import math
+import os
+import sys
+
+import lorasim3
+import topo_builder
+import sweep
+import json_export
+
+
+GOLDEN_DIR="results/golden"
+
+EXPERIMENTS=[4,"SF7BW500CAD4"]
+FULL_DISTANCES=[True,False]
+# protocols: names of sweep.PROTOCOLS, then variants of CANL22
+PROTOCOLS={
+    "CANL22":sweep.protocol_params("CANL22"),
+    "CANL22_1-4":sweep.protocol_params("CANL22_1/4"),
+    "CANL22_softer_fair":dict(sweep.protocol_params("CANL22"),CANL22_softer_fair=True),
+    "CANL22_no_check_busy":dict(sweep.protocol_params("CANL22"),CANL22_check_busy=False),
+    "ideal_FIFO":sweep.protocol_params("ideal_FIFO"),
+    "CAD+Backoff":sweep.protocol_params("CAD+Backoff"),
+    "ALOHA":sweep.protocol_params("ALOHA"),
+}
+
+SEED=2023
+N_NODES=30
+AVG_SEND_TIME=150000
+# scheduled packets per device, None for the default of lorasim3: the golden files of results/golden are recorded
+# with the first version of the seeded random streams, before params["packets_per_node"]
+PACKETS_PER_NODE=None
+
+
+# name -> params of every scenario, params["topo"] being the experiment of its topology (replaced by the topology dict to run)
+def scenarios():
+    scenario_params={}
+    for experiment in EXPERIMENTS:
+        for full_distances in FULL_DISTANCES:
+            for proto in PROTOCOLS:
+                params=dict(sweep.BASE_PARAMS)
+                params.update({
+                    "start_time":"golden",
+                    "log_events":False,
+                    "experiment":experiment,
+                    "topo":experiment,
+                    "var_CAD_prob":True,
+                    "CAD_prob":100,
+                    "full_distances":full_distances,
+                    "topo_scale":1,
+                    "nrNodes":N_NODES,
+                    "avgSendTime":AVG_SEND_TIME,
+                    "seed":SEED,
+                    })
+                if PACKETS_PER_NODE is not None:
+                    params["packets_per_node"]=PACKETS_PER_NODE
+                params.update(PROTOCOLS[proto])
+                scenario_params["{0}_{1}_{2}".format(experiment,"fd" if full_distances else "gw",proto)]=params
+    return scenario_params
+
+
+# a value as read back from JSON (string keys, lists), for exact comparisons
+def as_json(value):
+    return json.loads(json_export.dumps(value))
+
+
+# the topology dict of a golden file (JSON has string keys)
+def topo_from_json(topo):
+    topo=dict(topo)
+    topo["nodes"]={int(node_id):node for node_id,node in topo["nodes"].items()}
+    return topo
+
+
+# outputs of a scenario on its topology
+def golden_outputs(params,topo):
+    res=lorasim3.main_with_params(dict(params,topo=topo))
+    return as_json({"TOTAL":res["TOTAL"],"nodes":res["nodes"]})
+
+
+def record(golden_dir=GOLDEN_DIR):
+    if not os.path.exists(golden_dir):
+        os.makedirs(golden_dir)
+    topos={experiment:topo_builder.build_topo(N_NODES,experiment,seed=SEED) for experiment in EXPERIMENTS}
+    scenario_params=scenarios()
+    for name in scenario_params:
+        params=scenario_params[name]
+        golden={"scenario":name,"params":params,"topo":topos[params["topo"]]}
+        golden.update(golden_outputs(params,topos[params["topo"]]))
+        json_export.dump(golden,os.path.join(golden_dir,name+".json"))
+    return list(scenario_params)
+
+
+def tolerance_of(path,tolerances):
+    for key in [".".join(path[:i]) for i in range(len(path),1,-1)]+[path[-1],path[0]]:
+        if key in tolerances:
+            return tolerances[key]
+    return None
+
+
+def same_value(golden,candidate,tolerance):
+    if isinstance(golden,bool) or isinstance(candidate,bool) or not isinstance(golden,(int,float)) or not isinstance(candidate,(int,float)):
+        return golden==candidate
+    if math.isnan(golden) or math.isnan(candidate):
+        return math.isnan(golden) and math.isnan(candidate)
+    if tolerance is None:
+        return golden==candidate
+    return abs(golden-candidate)<=(tolerance["atol"] if "atol" in tolerance else 0)+(tolerance["rtol"] if "rtol" in tolerance else 0)*abs(golden)
+
+
+# differences between golden and candidate outputs: a list of (path, golden value, candidate value)
+def differences(golden,candidate,tolerances={},path=()):
+    if isinstance(golden,dict) and isinstance(candidate,dict):
+        diffs=[]
+        for key in golden:
+            if key not in candidate:
+                diffs.append((path+(key,),golden[key],"<missing>"))
+            else:
+                diffs+=differences(golden[key],candidate[key],tolerances,path+(key,))
+        diffs+=[(path+(key,),"<missing>",candidate[key]) for key in candidate if key not in golden]
+        return diffs
+    if isinstance(golden,list) and isinstance(candidate,list):
+        if len(golden)!=len(candidate):
+            return [(path,"<{0} items>".format(len(golden)),"<{0} items>".format(len(candidate)))]
+        diffs=[]
+        for i in range(len(golden)):
+            diffs+=differences(golden[i],candidate[i],tolerances,path+(str(i),))
+        return diffs
+    if same_value(golden,candidate,tolerance_of(path,tolerances) if len(path)>0 else None):
+        return []
+    return [(path,golden,candidate)]
+
+
+# compare the current code with every golden file, returns {scenario: differences}
+def compare(golden_dir=GOLDEN_DIR,tolerances={}):
+    goldens=[]
+    for file_name in sorted(os.listdir(golden_dir)):
+        if file_name.endswith(".json"):
+            with open(os.path.join(golden_dir,file_name)) as golden_file:
+                goldens.append(json.load(golden_file))
+    # one dict per topology, the runs of a same topology reuse its matrices (see lorasim3.get_base_matrices)
+    topos={}
+    for golden in goldens:
+        if golden["params"]["topo"] not in topos:
+            topos[golden["params"]["topo"]]=topo_from_json(golden["topo"])
+
+    report={}
+    for golden in goldens:
+        candidate=golden_outputs(golden["params"],topos[golden["params"]["topo"]])
+        report[golden["scenario"]]=differences({"TOTAL":golden["TOTAL"],"nodes":golden["nodes"]},candidate,tolerances)
+    return report
+
+
+if __name__ == '__main__':
+
+    mode=sys.argv[1] if len(sys.argv)>1 else "compare"
+    golden_dir=sys.argv[2] if len(sys.argv)>2 else GOLDEN_DIR
+
+    # lorasim3 silences stdout
+    out=lorasim3.stdout_print_target
+    if mode=="record":
+        names=record(golden_dir)
+        print("{0} scenarios recorded in {1}".format(len(names),golden_dir),file=out)
+    elif mode=="compare":
+        tolerances={}
+        if len(sys.argv)>3:
+            tolerances={"TOTAL":{"rtol":float(sys.argv[3])},"nodes":{"rtol":float(sys.argv[3])}}
+        report=compare(golden_dir,tolerances)
+        n_moved=0
+        for name in report:
+            print("{0}: {1}".format(name,"same" if len(report[name])==0 else "{0} differences".format(len(report[name]))),file=out)
+            for path,golden_value,candidate_value in report[name][:10]:
+                print("    {0}: {1} -> {2}".format(".".join(path),golden_value,candidate_value),file=out)
+            n_moved+=len(report[name])>0
+        print("{0}/{1} scenarios moved".format(n_moved,len(report)),file=out)
+        sys.exit(1 if n_moved>0 else 0)
+    else:
+        print("usage: python golden.py record|compare [golden_dir] [rtol]",file=out)
+        sys.exit(2)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+######################### JSON export for the LoRaSim3 Simulator #############################
+######################### https://github.com/Guillaumegaillard/CANL-LoRa #####################
+######################### unguaranteed public version ########################################
+
+# Results are written one run at a time, so that memory does not grow with the number of runs:
+## export_json:  a JSON array of runs, laid out as json.dumps(runs, indent=4) did
+## export_jsonl: JSON Lines, one run per line
+## dump:         a single object (e.g. a res dict), streamed by json.dump
+# NumPy scalars and arrays (np.mean, np.std, ...) are converted to their python equivalents.
+
+import numpy as np
+import json
+
+
+# json "default" hook for what the json module does not know
+def numpy_default(value):
+    if isinstance(value,np.generic):
+        return value.item()
+    if isinstance(value,np.ndarray):
+        return value.tolist()
+    if isinstance(value,(set,frozenset)):
+        return list(value)
+    raise TypeError("Object of type {0} is not JSON serializable".format(type(value).__name__))
+
+
+def dumps(value,indent=None):
+    return json.dumps(value,indent=indent,default=numpy_default)
+
+
+def dump(value,path,indent=4):
+    with open(path,"w") as outfile:
+        json.dump(value,outfile,indent=indent,default=numpy_default)
+
+
+# write the runs of an iterable as a JSON array, returns the number of runs
+def export_json(runs,path,indent=4):
+    n_runs=0
+    with open(path,"w") as outfile:
+        outfile.write("[")
+        for run in runs:
+            outfile.write("," if n_runs>0 else "")
+            if indent is None:
+                outfile.write(dumps(run))
+            else:
+                # nested one level, as an item of the array
+                outfile.write("\n"+" "*indent+dumps(run,indent).replace("\n","\n"+" "*indent))
+            n_runs+=1
+        outfile.write("\n]" if indent is not None and n_runs>0 else "]")
+    return n_runs
+
+
+# write the runs of an iterable as JSON Lines, returns the number of runs
+def export_jsonl(runs,path):
+    n_runs=0
+    with open(path,"w") as outfile:
+        for run in runs:
+            outfile.write(dumps(run)+"\n")
+            n_runs+=1
+    return n_runs
@@ -13,15 +13,26 @@ import math
 import sys
 import os
 import pickle
-import logging
+import time
 
 import constants
+import traffic_trace
+import event_trace
+import topo_builder
+import profiling
 
 if not os.path.exists('results'):
     os.makedirs('results')
 
 rng = np.random.default_rng()
 
+# independent random streams of a run (see main_with_params), all of them rng when the run is not seeded
+RNG_STREAMS=["traffic","channel","cad","backoff"]
+traffic_rng = rng      # generation dates and payload sizes
+channel_rng = rng      # PHY settings, path loss exponents, noise and fading
+cad_rng = rng          # CAD successes
+backoff_rng = rng      # backoffs, listen windows and other MAC draws
+
 
 
 
@@ -83,40 +94,6 @@ bsId = 1
 ##### FUNCTIONS
 ################################
 
-### If log_events is acitvated, the call to this function will initiate the logs process
-def load_main_logger(start_time):
-    
-    ###########LOGGING MAIN EVENTS
-    MainLogger = logging.getLogger('Main_Logger')
-    MainLogger.setLevel(logging.INFO)
-    # create file handler which logs even debug messages
-    mfh = logging.FileHandler('{0}.log'.format(start_time), mode='w')
-    mfh.setLevel(logging.INFO)
-    #console
-    mch = logging.StreamHandler()
-    mch.setLevel(logging.CRITICAL)
-    # create formatter and add it to the handlers
-    mformatter = logging.Formatter('%(asctime)s %(message)s')
-    mfh.setFormatter(mformatter)
-    mch.setFormatter(mformatter)
-    
-    close_logger_handlers(MainLogger)
-    
-    # add the handlers to logger
-    MainLogger.addHandler(mfh)
-    MainLogger.addHandler(mch)
-    
-    return (MainLogger)
-
-### shut down logging when experiment stops
-def close_logger_handlers(logger_obj):
-    handlers = logger_obj.handlers[:]
-    for handler in handlers:
-        handler.close()
-        logger_obj.removeHandler(handler)
-
-
-
 ############################
 ############################
 # check for collisions at base station and among devices
@@ -161,17 +138,17 @@ def checkcollision(packet):
                                     col = 1
                                     packet.collided = 1
                                     if log_events:
-                                        MainLogger.info(("GW","col",packet.nodeid,packet.nodeid,env.now))
+                                        MainTrace.record(env.now,event_trace.GW_ID,event_trace.COL,packet.nodeid,packet.nodeid)
                             if other.packet in c:
                                 other.packet.collided = 1
                                 if log_events:
-                                    MainLogger.info(("GW","col",packet.nodeid,other.packet.nodeid,env.now))
+                                    MainTrace.record(env.now,event_trace.GW_ID,event_trace.COL,packet.nodeid,other.packet.nodeid)
                         else:
                             packet.collided = 1
                             other.packet.collided = 1     # other also got lost, if it wasn't lost already
                             if log_events:
-                                MainLogger.info(("GW","col",packet.nodeid,packet.nodeid,env.now))
-                                MainLogger.info(("GW","col",packet.nodeid,other.packet.nodeid,env.now))
+                                MainTrace.record(env.now,event_trace.GW_ID,event_trace.COL,packet.nodeid,packet.nodeid)
+                                MainTrace.record(env.now,event_trace.GW_ID,event_trace.COL,packet.nodeid,other.packet.nodeid)
                             col = 1            
 
             #This protocol has a listening phase impaired by a local collision            
@@ -188,7 +165,7 @@ def checkcollision(packet):
                     for other in packetsOnAir:
                         for node in nodes:
                             if log_events:
-                                MainLogger.info((node.nodeid,"col",packet.nodeid,other.nodeid,env.now))
+                                MainTrace.record(env.now,node.nodeid,event_trace.COL,packet.nodeid,other.nodeid)
             
 
     ############### Packet has been received at GW. Let's see elsewhere
@@ -200,7 +177,7 @@ def checkcollision(packet):
     #normally, here, the packet has been correctly received at GW (not collided)
     if not col:
         if log_events:
-            MainLogger.info(("GW","rx",packet.nodeid,env.now))
+            MainTrace.record(env.now,event_trace.GW_ID,event_trace.RX,packet.nodeid)
 
     # old "everywhere is the same as GW" case 
     if not full_distances:   
@@ -223,14 +200,14 @@ def checkcollision(packet):
                             "id":packet.nodeid,
                             "toa":packet.rectime,
                             "is_RTS":packet.ptype == rtsPacketType,
-                            "dataPayloadSize_in_RTS":rng.integers(0,max_payload_size+1) if packet.dataPayloadSize==(CANL_rts_hdr_size+1) else packet.dataPayloadSize, # if Data of RTS size, random size
+                            "dataPayloadSize_in_RTS":backoff_rng.integers(0,max_payload_size+1) if packet.dataPayloadSize==(CANL_rts_hdr_size+1) else packet.dataPayloadSize, # if Data of RTS size, random size
                             "dataPayloadSize_in_EH":packet.dataPayloadSize, # in explicit header
                             "start":env.now,
                             "capturing":[p.nodeid for p in packetsOnAir],
                             "captured_by":[p.nodeid for p in packetsOnAir],
                             })
                         if log_events:
-                            MainLogger.info((node.nodeid,"rx",packet.nodeid,env.now))
+                            MainTrace.record(env.now,node.nodeid,event_trace.RX,packet.nodeid)
 
     else:
         # # general case 
@@ -266,15 +243,15 @@ def checkcollision(packet):
                                                 locally_collided=True
                                                 previous_frames_impacting_this_one.append(other.packet.nodeid)
                                                 if log_events:
-                                                    MainLogger.info((node.nodeid,"col",packet.nodeid,packet.nodeid,env.now))
+                                                    MainTrace.record(env.now,node.nodeid,event_trace.COL,packet.nodeid,packet.nodeid)
                                         if other.packet in c:
                                             if log_events:
-                                                MainLogger.info((node.nodeid,"col",packet.nodeid,other.packet.nodeid,env.now))
+                                                MainTrace.record(env.now,node.nodeid,event_trace.COL,packet.nodeid,other.packet.nodeid)
                                             previous_frames_impacted_by_this_one.append(other.packet.nodeid)
                                     else:
                                         if log_events:
-                                            MainLogger.info((node.nodeid,"col",packet.nodeid,other.packet.nodeid,env.now))
-                                            MainLogger.info((node.nodeid,"col",packet.nodeid,packet.nodeid,env.now))
+                                            MainTrace.record(env.now,node.nodeid,event_trace.COL,packet.nodeid,other.packet.nodeid)
+                                            MainTrace.record(env.now,node.nodeid,event_trace.COL,packet.nodeid,packet.nodeid)
                                         previous_frames_impacting_this_one.append(other.packet.nodeid)
                                         previous_frames_impacted_by_this_one.append(other.packet.nodeid)
                                         locally_collided=True
@@ -284,7 +261,7 @@ def checkcollision(packet):
                             "id":packet.nodeid,
                             "toa":packet.rectime,
                             "is_RTS":packet.ptype == rtsPacketType,
-                            "dataPayloadSize_in_RTS":rng.integers(0,max_payload_size+1) if packet.dataPayloadSize==(CANL_rts_hdr_size+1) else packet.dataPayloadSize, # if Data of RTS size, random size
+                            "dataPayloadSize_in_RTS":backoff_rng.integers(0,max_payload_size+1) if packet.dataPayloadSize==(CANL_rts_hdr_size+1) else packet.dataPayloadSize, # if Data of RTS size, random size
                             "dataPayloadSize_in_EH":packet.dataPayloadSize, # in explicit header
                             "start":env.now,
                             "capturing":previous_frames_impacted_by_this_one,
@@ -293,7 +270,7 @@ def checkcollision(packet):
                         
                         if not locally_collided:
                             if log_events:
-                                MainLogger.info((node.nodeid,"rx",packet.nodeid,env.now))
+                                MainTrace.record(env.now,node.nodeid,event_trace.RX,packet.nodeid)
 
     return col
 
@@ -371,17 +348,30 @@ def powerCollision(p1, p2, in_ears=2,local=-1):
     if abs(rssi1 - rssi2) < PCT:
         # packets are too close to each other, both collide
         # return both packets as casualties
-        powerCaptures.append((in_ears,False,local))
+        count_power_check(in_ears,False,local)
         return (p1, p2)
     elif rssi1 - rssi2 < PCT:
         # p2 overpowered p1, return p1 as casualty
-        powerCaptures.append((in_ears,True,local))
+        count_power_check(in_ears,True,local)
         return (p1,)
     # print("p1 wins, p2 lost")
     # p2 was the weaker packet, return it as a casualty
-    powerCaptures.append((in_ears,True,local))
+    count_power_check(in_ears,True,local)
     return (p2,)
 
+#
+# update the power capture counters of a receiver, a device or the GW (local=-1, last slot)
+def count_power_check(in_ears,captured,local):
+    pc_checks[local]+=1
+    pc_sum_in_ears[local]+=in_ears
+    if in_ears>pc_max_in_ears[local]:
+        pc_max_in_ears[local]=in_ears
+    if captured:
+        pc_caps[local]+=1
+        pc_sum_in_ears_with_capture[local]+=in_ears
+        if in_ears>pc_max_capture_in_ears[local]:
+            pc_max_capture_in_ears[local]=in_ears
+
 #
 # check the time concommitance of two transmissions
 def timingCollision(p1, p2, ocurring_now=True):
@@ -472,6 +462,9 @@ class myNode():
 
         # distance to GW
         self.dist = np.sqrt((self.x-bsx)*(self.x-bsx)+(self.y-bsy)*(self.y-bsy))
+
+        # random stream of its generations and payload sizes (see crn)
+        self.traffic_rng = node_traffic_rngs[nodeid]
         
         # node has a packet
         self.packet = myPacket(self.nodeid, packetlen, self.dist)
@@ -542,12 +535,27 @@ class myNode():
         self.n_dropped=0
         self.cycle=0
 
+        # time spent transmitting, accumulated at the end of each transmission
+        self.tx_time=0
+        self.first_tx_start=0
+        self.last_tx_stop=0
+
         self.latency=0
         self.success_latency=0
         self.min_success_latency=self.period*1000
         self.Wbusy_BE=Wbusy_BE
 
-        self.gen_times=[0]
+        # running statistics of the inter-generation times (Welford), first generation counted from 0
+        self.last_gen_time=0
+        self.n_IGT=0
+        self.mean_IGT=0
+        self.M2_IGT=0
+
+        # pregenerated (pregen_traffic) or traced (traffic_trace) dates and payload sizes, consumed by index
+        self.traffic_gen_times=np.empty(0)
+        self.traffic_sizes=np.empty(0,dtype=int)
+        self.traffic_size_offset=0 # header size added to the drawn sizes
+        self.traffic_index=0
         
         # # graphics for node
         # # global graphics
@@ -597,16 +605,16 @@ class myNode():
                                                 locally_collided=True
                                                 previous_frames_impacting_this_one.append(other.packet.nodeid)
                                                 if log_events:
-                                                    MainLogger.info((self.nodeid,"col",packet.nodeid,packet.nodeid,env.now))
+                                                    MainTrace.record(env.now,self.nodeid,event_trace.COL,packet.nodeid,packet.nodeid)
                                         if other.packet in c:
                                             if log_events:
-                                                MainLogger.info((self.nodeid,"col",packet.nodeid,other.packet.nodeid,env.now))
+                                                MainTrace.record(env.now,self.nodeid,event_trace.COL,packet.nodeid,other.packet.nodeid)
                                             previous_frames_impacted_by_this_one.append(other.packet.nodeid)
 
                                     else:
                                         if log_events:
-                                            MainLogger.info((self.nodeid,"col",packet.nodeid,other.packet.nodeid,env.now))
-                                            MainLogger.info((self.nodeid,"col",packet.nodeid,packet.nodeid,env.now))
+                                            MainTrace.record(env.now,self.nodeid,event_trace.COL,packet.nodeid,other.packet.nodeid)
+                                            MainTrace.record(env.now,self.nodeid,event_trace.COL,packet.nodeid,packet.nodeid)
                                         previous_frames_impacting_this_one.append(other.packet.nodeid)
                                         previous_frames_impacted_by_this_one.append(other.packet.nodeid)
                                         locally_collided=True
@@ -615,7 +623,7 @@ class myNode():
                             "id":packet.nodeid,
                             "toa":packet.rectime,
                             "is_RTS":packet.ptype == rtsPacketType,
-                            "dataPayloadSize_in_RTS":rng.integers(0,max_payload_size+1) if packet.dataPayloadSize==(CANL_rts_hdr_size+1) else packet.dataPayloadSize, # if Data of RTS size, random size
+                            "dataPayloadSize_in_RTS":backoff_rng.integers(0,max_payload_size+1) if packet.dataPayloadSize==(CANL_rts_hdr_size+1) else packet.dataPayloadSize, # if Data of RTS size, random size
                             "dataPayloadSize_in_EH":packet.dataPayloadSize, # in explicit header
                             "start":packet.addTime,
                             "capturing":previous_frames_impacted_by_this_one,
@@ -627,7 +635,7 @@ class myNode():
                             "id":packet.nodeid,
                             "toa":packet.rectime,
                             "is_RTS":packet.ptype == rtsPacketType,
-                            "dataPayloadSize_in_RTS":rng.integers(0,max_payload_size+1) if packet.dataPayloadSize==(CANL_rts_hdr_size+1) else packet.dataPayloadSize, # if Data of RTS size, random size
+                            "dataPayloadSize_in_RTS":backoff_rng.integers(0,max_payload_size+1) if packet.dataPayloadSize==(CANL_rts_hdr_size+1) else packet.dataPayloadSize, # if Data of RTS size, random size
                             "dataPayloadSize_in_EH":packet.dataPayloadSize, # in explicit header
                             "start":packet.addTime,
                             "capturing":[],# what happenned prior to 0 is not on air anymore
@@ -636,7 +644,7 @@ class myNode():
 
                     if not locally_collided:
                         if log_events:
-                            MainLogger.info((self.nodeid,"rx",packet.nodeid,env.now))
+                            MainTrace.record(env.now,self.nodeid,event_trace.RX,packet.nodeid)
 
     # node function called in CANL at the end of listen phase
     # Check what have been heard and if more time is needed to finish a reception of header
@@ -749,14 +757,18 @@ class myPacket():
         self.txpow = Ptx
         self.distance_to_GW=distance
 
+        # random streams of the node (shared by all nodes unless crn)
+        self.traffic_rng = node_traffic_rngs[nodeid]
+        self.channel_rng = node_channel_rngs[nodeid]
+
         # randomize configuration values
         if lora24GHz:
-            self.sf = rng.integers(5,13)
-            self.bw = rng.choice([203.125, 406.250, 812.5, 1625])
+            self.sf = self.channel_rng.integers(5,13)
+            self.bw = self.channel_rng.choice([203.125, 406.250, 812.5, 1625])
         else:    
-            self.sf = rng.integers(6,13)
-            self.bw = rng.choice([125, 250, 500])
-        self.cr = rng.integers(1,5)
+            self.sf = self.channel_rng.integers(6,13)
+            self.bw = self.channel_rng.choice([125, 250, 500])
+        self.cr = self.channel_rng.integers(1,5)
 
         # for certain experiments override these
         if experiment==1 or experiment == 0:
@@ -850,24 +862,24 @@ class myPacket():
         # Path loss exponents to neighs
         self.gamma_array = np.zeros((distance_matrix[self.nodeid].shape))
         if normal_gamma_ED:
-            self.gamma_array = rng.normal(gamma_ED,sigma_gamma_ED,self.gamma_array.shape)
+            self.gamma_array = self.channel_rng.normal(gamma_ED,sigma_gamma_ED,self.gamma_array.shape)
         else:
             self.gamma_array += gamma_ED
 
 
         # frequencies: lower bound + number of 61 Hz steps
         if lora24GHz:
-            self.freq = 2403000000 + rng.integers(0,2622951)
+            self.freq = 2403000000 + self.channel_rng.integers(0,2622951)
         else:
-            self.freq = 860000000 + rng.integers(0,2622951)
+            self.freq = 860000000 + self.channel_rng.integers(0,2622951)
 
         # for certain experiments override these and
         # choose some random frequences
         if experiment == 1:
             if lora24GHz:
-                self.freq = rng.choice([2403000000, 2425000000, 2479000000])
+                self.freq = self.channel_rng.choice([2403000000, 2425000000, 2479000000])
             else:
-                self.freq = rng.choice([860000000, 864000000, 868000000])
+                self.freq = self.channel_rng.choice([860000000, 864000000, 868000000])
         else:
             if lora24GHz:
                 self.freq = 2403000000
@@ -904,9 +916,9 @@ class myPacket():
     def setDataPayloadSize(self):
         if variablePayloadSize:
             if normalPayloadSize :
-                self.dataPayloadSize=rng.normal(normaldist_mean_payload_size,normaldist_sigma_payload_size,1).astype('int').clip(dist_min_payload_size,dist_max_payload_size)[0]
+                self.dataPayloadSize=self.traffic_rng.normal(normaldist_mean_payload_size,normaldist_sigma_payload_size,1).astype('int').clip(dist_min_payload_size,dist_max_payload_size)[0]
             else: # uniform
-                self.dataPayloadSize=rng.integers(dist_min_payload_size,dist_max_payload_size+1)
+                self.dataPayloadSize=self.traffic_rng.integers(dist_min_payload_size,dist_max_payload_size+1)
 
             if CANL22: #depends on scenario, data length included in header or in data... 
                 self.dataPayloadSize+=CANL_data_hdr_size
@@ -934,18 +946,18 @@ class myPacket():
         noise_dB = 0 # to GW
         noise_dB_arr = np.zeros((distance_matrix[self.nodeid].shape)) # to all neighs
         if gaussian_noise:
-            noise_dB = np.clip(rng.normal(constants.noise_mu_dB,constants.noise_sigma_dB),0,2*constants.noise_mu_dB)
-            noise_dB_arr = np.clip(rng.normal(constants.noise_mu_dB,constants.noise_sigma_dB,noise_dB_arr.shape),0,2*constants.noise_mu_dB)
+            noise_dB = np.clip(self.channel_rng.normal(constants.noise_mu_dB,constants.noise_sigma_dB),0,2*constants.noise_mu_dB)
+            noise_dB_arr = np.clip(self.channel_rng.normal(constants.noise_mu_dB,constants.noise_sigma_dB,noise_dB_arr.shape),0,2*constants.noise_mu_dB)
 
         rayleigh_dB = 0
         rayleigh_dB_arr = np.zeros((distance_matrix[self.nodeid].shape))
         
         if rayleigh_fading:
-            rayleigh_dB = rng.rayleigh(scale=np.sqrt(2 / np.pi)*rayleigh_mean_dB) - rayleigh_mean_dB
-            rayleigh_dB_arr = rng.rayleigh(scale=np.sqrt(2 / np.pi)*rayleigh_mean_dB,size=rayleigh_dB_arr.shape) - rayleigh_mean_dB
+            rayleigh_dB = self.channel_rng.rayleigh(scale=np.sqrt(2 / np.pi)*rayleigh_mean_dB) - rayleigh_mean_dB
+            rayleigh_dB_arr = self.channel_rng.rayleigh(scale=np.sqrt(2 / np.pi)*rayleigh_mean_dB,size=rayleigh_dB_arr.shape) - rayleigh_mean_dB
 
         # matrix of every path loss
-        self.rx_array=np.clip(-1000,self.txpow,self.txpow + constants.GL - constants.Lpld0 - 10*self.gamma_array*np.log10(distance_matrix[self.nodeid]/constants.d0) - noise_dB_arr - rayleigh_dB_arr  )
+        self.rx_array=np.clip(-1000,self.txpow,self.txpow + constants.GL - constants.Lpld0 - 10*self.gamma_array*(log_distance_matrix[self.nodeid] + log_topo_scale) - noise_dB_arr - rayleigh_dB_arr  )
         self.rssi=min(self.txpow,self.txpow + constants.GL_GW - constants.Lpld0 - 10*gamma_GW*math.log10(self.distance_to_GW/constants.d0) - noise_dB - rayleigh_dB)
 
         
@@ -961,6 +973,8 @@ def get_CAD_prob(distance):
 #
 ## CAD mechanism "requires" energy is received from a transmitter during all the CAD duration, hence we need a copy of the global on-air list 
 def start_CAD(node):
+    if log_events:
+        MainTrace.record(env.now,node.nodeid,event_trace.CAD_START)
     return [ transmitter.nodeid for transmitter in packetsOnAir ]
 
 #
@@ -973,42 +987,323 @@ def stop_CAD(node,on_air_at_CAD_start):
         if devid in on_air_at_CAD_start:
             if var_CAD_prob:
                 if full_distances:
-                    if rng.random()*100 <= get_CAD_prob(distance_matrix[node.nodeid][devid]):
+                    if cad_rng.random()*100 <= get_CAD_prob(distance_matrix[node.nodeid][devid]*topo_scale):
                         if log_events:
-                            MainLogger.info((node.nodeid,"CAD+",env.now))
+                            MainTrace.record(env.now,node.nodeid,event_trace.CAD_POS)
                         return (True)
                 else:
-                    if rng.random()*100 <= get_CAD_prob(node.dist):
+                    if cad_rng.random()*100 <= get_CAD_prob(node.dist):
                         if log_events:
-                            MainLogger.info((node.nodeid,"CAD+",env.now))                        
+                            MainTrace.record(env.now,node.nodeid,event_trace.CAD_POS)                        
                         return (True)                    
             else:
-                if rng.random()*100 <= CAD_prob and CAD_prob!=0:
+                if cad_rng.random()*100 <= CAD_prob and CAD_prob!=0:
                     if log_events:
-                        MainLogger.info((node.nodeid,"CAD+",env.now))                    
+                        MainTrace.record(env.now,node.nodeid,event_trace.CAD_POS)                    
                     return (True)                    
     if log_events:
-        MainLogger.info((node.nodeid,"CAD-",env.now))
+        MainTrace.record(env.now,node.nodeid,event_trace.CAD_NEG)
     return False              
 
 #
-## Build a numpy array of distances inter devices
-def build_dist_mat(topo):
-    dist_mat=np.zeros((nrNodes,nrNodes))
-
-
-    for i in range(nrNodes):
-        for j in range(nrNodes):
-            if j!=i:
-                dist_mat[i][j]=(
-                    (topo['nodes'][i]['x']-topo['nodes'][j]['x'])**2+
-                    (topo['nodes'][i]['y']-topo['nodes'][j]['y'])**2
-                    )**(1/2)
-            else:
-                dist_mat[i][j]=0.01 #avoid log10(0) (aka I am 1cm away from myself)
+## Build a numpy array of distances inter devices (the first n_nodes of topo)
+def build_dist_mat(topo,n_nodes):
+    x=np.array([topo['nodes'][i]['x'] for i in range(n_nodes)])
+    y=np.array([topo['nodes'][i]['y'] for i in range(n_nodes)])
+
+    dist_mat=((x[:,np.newaxis]-x[np.newaxis,:])**2+(y[:,np.newaxis]-y[np.newaxis,:])**2)**(1/2)
+    np.fill_diagonal(dist_mat,0.01) #avoid log10(0) (aka I am 1cm away from myself)
 
     return dist_mat
 
+#
+## distance matrix of the first n_nodes devices of a topology, and its log-distance log10(d/d0),
+## the distance term of every path loss (the path loss exponents are drawn per device).
+## Both at scale 1: at topo_scale s, distances are multiplied by s, log-distances offset by log10(s)
+def build_path_loss_matrices(topo,n_nodes):
+    dist_mat=build_dist_mat(topo,n_nodes)
+    return dist_mat,np.log10(dist_mat/constants.d0)
+
+# base (scale 1) matrices of the topologies of the last runs of this process: [(topo,distance,log-distance),...], the most
+# recently used last, reused by the next runs of a same topology dict (e.g. topo_builder.get_topo of a same file), at any
+# scale or number of devices. Only BASE_MATRICES_KEPT topologies are kept, N x N matrices are big: runs alternating
+# between more topologies (e.g. a loop over protocols outside a loop over repetitions) rebuild them, group them by topology.
+BASE_MATRICES_KEPT=2
+base_matrices=[]
+
+#
+## base matrices of the first n_nodes devices of a topology: submatrices (views) of the cached ones
+def get_base_matrices(topo,n_nodes):
+    global base_matrices
+    cached=[i for i,entry in enumerate(base_matrices) if entry[0] is topo and len(entry[1])>=n_nodes]
+    if len(cached)>0:
+        entry=base_matrices.pop(cached[0])
+    else:
+        # free the least recently used ones (and former smaller ones of this topology) before building
+        base_matrices=[entry for entry in base_matrices if entry[0] is not topo][-(BASE_MATRICES_KEPT-1):] if BASE_MATRICES_KEPT>1 else []
+        entry=(topo,)+build_path_loss_matrices(topo,n_nodes)
+    base_matrices.append(entry)
+    topo,dist_mat,log_dist_mat=entry
+    return dist_mat[:n_nodes,:n_nodes],log_dist_mat[:n_nodes,:n_nodes]
+
+#
+## wrap the hot functions with counters and timers (see profiling.py) until restored, with the mean
+## number of packets on air (or of frames heard) at each call, and count the SimPy events processed by env
+def start_profiler(env):
+    profiler=profiling.Profiler()
+    this_module=sys.modules[__name__]
+    profiler.instrument(this_module,"checkcollision",size=lambda packet:len(packetsOnAir),size_name="packetsOnAir")
+    profiler.instrument(this_module,"check_heard")
+    profiler.instrument(this_module,"powerCollision")
+    profiler.instrument(myNode,"start_listening",size=lambda node:len(packetsOnAir),size_name="packetsOnAir")
+    profiler.instrument(myNode,"stop_listening",size=lambda node:len(node.heard_frames),size_name="heard_frames")
+    profiler.instrument(myPacket,"repropagate")
+    profiler.instrument(this_module,"start_CAD",size=lambda node:len(packetsOnAir),size_name="packetsOnAir")
+    profiler.instrument(this_module,"stop_CAD",size=lambda node,on_air_at_CAD_start:len(packetsOnAir),size_name="packetsOnAir")
+    profiler.instrument(env,"step",label="simpy_events")
+    return profiler
+
+#
+## switch the event trace (log_events) on within the given simulated time windows only, off elsewhere
+## (the run stops at the end of the simulation, with windows left or not, see sim_end in main_with_params)
+def trace_window_switch(env,windows):
+    global log_events
+
+    log_events=False
+    for start,stop in sorted(windows):
+        if stop<=env.now: # within a previous window
+            continue
+        if start>env.now:
+            log_events=False
+            yield env.timeout(start-env.now)
+        log_events=True
+        yield env.timeout(stop-env.now)
+    log_events=False
+
+#
+## account for the channel occupation when a transmission starts
+## starts come in chronological order, so busy periods (union of transmissions) are merged on the fly:
+## only the current period is kept, the previous ones are summed up in chan_busy_dur
+def account_channel_busy(start,duration):
+    global chan_busy_dur,chan_first_start,chan_busy_since,chan_busy_until
+
+    if chan_first_start==-1:
+        chan_first_start=start
+        chan_busy_since=start
+    elif start>=chan_busy_until: # the channel was free, close the current busy period
+        chan_busy_dur+=chan_busy_until-chan_busy_since
+        chan_busy_since=start
+    chan_busy_until=max(chan_busy_until,start+duration)
+
+#
+## account for a transmission of a node (RTS or DATA) once it is over
+def account_tx_time(node,start,duration):
+    if node.first_tx_start==0:
+        node.first_tx_start=start
+    node.tx_time+=duration
+    node.last_tx_stop=start+duration
+
+#
+## next inter-generation delay of a node, drawn according to its distribution
+def next_inter_gen_delay(env,node):
+    if experiment==6:
+        #normally 9 nodes with 100ms delay between each node
+        inter_gen_delay=node.cycle*node.period-env.now+node.nodeid*100
+    elif experiment==7:
+        #normally 5 nodes with 500ms delay between each node
+        inter_gen_delay=node.cycle*node.period-env.now+node.nodeid*500
+    else:
+        if node.distrib==perioDistribType:
+            inter_gen_delay=node.period
+        if node.distrib==expoDistribType:
+            inter_gen_delay = node.traffic_rng.exponential(float(node.period))
+            # transmit_wait = rng.expovariate(1.0/float(node.period))
+        if node.distrib==uniformDistribType:
+            inter_gen_delay = node.traffic_rng.uniform(max(2000,node.period-5000),node.period+5000)
+    return inter_gen_delay
+
+#
+## vectorized versions, n draws at once
+def inter_gen_delays(node,n):
+    if node.distrib==perioDistribType:
+        return np.full(n,float(node.period))
+    if node.distrib==expoDistribType:
+        return node.traffic_rng.exponential(float(node.period),n)
+    # uniformDistribType
+    return node.traffic_rng.uniform(max(2000,node.period-5000),node.period+5000,n)
+
+def draw_payload_sizes(node,n):
+    if not variablePayloadSize:
+        return np.full(n,node.packet.data_len)
+    if normalPayloadSize :
+        sizes=node.traffic_rng.normal(normaldist_mean_payload_size,normaldist_sigma_payload_size,n).astype('int').clip(dist_min_payload_size,dist_max_payload_size)
+    else: # uniform
+        sizes=node.traffic_rng.integers(dist_min_payload_size,dist_max_payload_size+1,n)
+    if CANL22: #depends on scenario, data length included in header or in data...
+        sizes+=CANL_data_hdr_size
+    return sizes
+
+#
+## draw a whole block of generations for a node in one vectorized shot (pregen_traffic mode)
+## dates are absolute (cumsum of inter-gen delays), sizes follow setDataPayloadSize()
+def pregenerate_traffic(node):
+    n=pregen_block_size
+
+    if len(node.traffic_gen_times)>0: # refill, go on from the last pregenerated date
+        last_gen_time=node.traffic_gen_times[-1]
+    else:
+        last_gen_time=-1
+        ### randomize first generation for each node... Not a great impact
+        if shuffle_start:
+            last_gen_time+=node.traffic_rng.uniform(0,node.period)
+    # sequential cumsum, same rounding as successive additions
+    node.traffic_gen_times=np.cumsum(np.concatenate(([last_gen_time],inter_gen_delays(node,n))))[1:]
+    node.traffic_sizes=draw_payload_sizes(node,n)
+    node.traffic_index=0
+
+#
+## merge two sets of running statistics (count, mean, sum of squared deviations), Chan et al.
+def merge_running_stats(n_a,mean_a,M2_a,n_b,mean_b,M2_b):
+    n=n_a+n_b
+    if n==0:
+        return 0,0,0
+    delta=mean_b-mean_a
+    return n,mean_a+delta*n_b/n,M2_a+M2_b+delta*delta*n_a*n_b/n
+
+#
+## count the network inter-generation times (IGTs between successive dates of all the nodes, 0 included) up to date *upto*:
+## every node has recorded its generations until then and records increasing dates, so the pending dates up to it,
+## sorted, are the next ones of the merged network dates (a k-way merge of the node streams, by batches)
+IGT_MERGE_BLOCK=4096 # pending dates triggering a merge, at least
+def merge_network_IGTs(upto):
+    global pending_gen_times,merged_gen_time,n_net_IGTs,n_short_net_IGTs,next_IGT_merge
+
+    pending=np.array(pending_gen_times)
+    ready=pending<=upto
+    batch=np.sort(pending[ready])
+    if len(batch)>0:
+        IGTs=np.diff(batch) if merged_gen_time is None else np.diff(batch,prepend=merged_gen_time)
+        n_net_IGTs+=len(IGTs)
+        n_short_net_IGTs+=np.count_nonzero(IGTs<1000)
+        merged_gen_time=batch[-1]
+    pending_gen_times=pending[~ready].tolist()
+    # a node late to record (busy) holds the others' dates back: merge again when they doubled
+    next_IGT_merge=max(IGT_MERGE_BLOCK,2*len(pending_gen_times))
+
+#
+## account for new generations (dates and sizes, header included)
+## the inter-generation times only update running statistics of the node,
+## the dates are merged on the fly for the network IGTs (see merge_network_IGTs()),
+## or all stored in a compact global array (sorted at the end) to keep them (keep_Global_TT_IGTs)
+def record_generations(node,gen_times,sizes,payload_hdr_size):
+    global nrScheduled
+    global gen_times_buf,n_gen_times
+
+    n=len(gen_times)
+    if keep_Global_TT_IGTs:
+        if n_gen_times+n>len(gen_times_buf): # grow the storage
+            gen_times_buf=np.concatenate((gen_times_buf,np.empty(max(n,len(gen_times_buf)))))
+        gen_times_buf[n_gen_times:n_gen_times+n]=gen_times
+    else:
+        pending_gen_times.extend(gen_times)
+
+    if n==1: # one at a time, most of the calls
+        gen_time=gen_times[0]
+        IGT=gen_time-node.last_gen_time
+        node.last_gen_time=gen_time
+        node.n_IGT+=1
+        delta=IGT-node.mean_IGT
+        node.mean_IGT+=delta/node.n_IGT
+        node.M2_IGT+=delta*(IGT-node.mean_IGT)
+        node.n_payload_gen+=sizes[0]-payload_hdr_size
+    else:
+        IGTs=np.diff(gen_times,prepend=node.last_gen_time)
+        node.last_gen_time=gen_times[-1]
+        mean_IGTs=IGTs.mean()
+        node.n_IGT,node.mean_IGT,node.M2_IGT=merge_running_stats(
+            node.n_IGT,node.mean_IGT,node.M2_IGT,
+            n,mean_IGTs,((IGTs-mean_IGTs)**2).sum())
+        node.n_payload_gen+=int(np.sum(sizes))-payload_hdr_size*n
+
+    n_gen_times+=n
+    node.cycle+=n
+    nrScheduled+=n
+
+    if not keep_Global_TT_IGTs and len(pending_gen_times)>=next_IGT_merge:
+        merge_network_IGTs(min(other.last_gen_time if other.n_IGT>0 else -np.inf for other in nodes))
+
+#
+## produce the generations due at env.now: the packet to be sent and those dropped while the node was busy
+## (counted in bulk, the first generation not in the past is sent, the previous ones are dropped)
+## returns the date of the next packet to be sent, None if the node's traffic trace is exhausted
+## payload_hdr_size is not counted as generated payload (CANL header)
+def generate_traffic(env,node,next_gen_time,payload_hdr_size=0):
+    if env.now<=next_gen_time: # not yet
+        return next_gen_time
+
+    if traffic_trace_file or pregen_traffic:
+        # consume the pregenerated/traced arrays by index
+        n_gen=0
+        while True:
+            if node.traffic_index==len(node.traffic_gen_times):
+                if traffic_trace_file: # nothing more to send, what was consumed is dropped
+                    node.n_dropped+=n_gen
+                    return None
+                pregenerate_traffic(node)
+            first=node.traffic_index
+            last=first+int(np.searchsorted(node.traffic_gen_times[first:],env.now)) # first date not in the past
+            found=last<len(node.traffic_gen_times)
+            if found:
+                last+=1
+            record_generations(node,node.traffic_gen_times[first:last],node.traffic_sizes[first:last]+node.traffic_size_offset,payload_hdr_size)
+            n_gen+=last-first
+            node.traffic_index=last
+            if found:
+                break
+        next_gen_time=float(node.traffic_gen_times[last-1])
+        node.packet.dataPayloadSize=int(node.traffic_sizes[last-1])+node.traffic_size_offset
+
+    else:
+        # produce next packet
+        inter_gen_delay=next_inter_gen_delay(env,node)
+        ### randomize first generation for each node... Not a great impact
+        if shuffle_start and next_gen_time==-1:
+            next_gen_time+=node.traffic_rng.uniform(0,node.period)
+        next_gen_time+=inter_gen_delay
+
+        # pick a random size
+        node.packet.setDataPayloadSize()
+        record_generations(node,[next_gen_time],[node.packet.dataPayloadSize],payload_hdr_size)
+        n_gen=1
+
+        # the node has been busy for long, the next ones are dropped until one is not in the past
+        while env.now>next_gen_time:
+            if experiment in [6,7]: # one by one, they depend on the simulated time
+                next_gen_time+=next_inter_gen_delay(env,node)
+                node.packet.setDataPayloadSize()
+                record_generations(node,[next_gen_time],[node.packet.dataPayloadSize],payload_hdr_size)
+                n_gen+=1
+            else:
+                # one vectorized draw of the expected number of generations in the elapsed interval (+3 sigmas)
+                # closed form for periodic traffic, the loop goes on in the (rare) case it was not enough
+                if node.distrib==perioDistribType:
+                    n=math.ceil((env.now-next_gen_time)/node.period)
+                else:
+                    mean_delay=node.period if node.distrib==expoDistribType else (max(2000,node.period-5000)+node.period+5000)/2
+                    n_expected=(env.now-next_gen_time)/mean_delay
+                    n=int(n_expected+3*math.sqrt(n_expected))+1
+                gen_times=np.cumsum(np.concatenate(([next_gen_time],inter_gen_delays(node,n))))[1:]
+                gen_times=gen_times[:np.searchsorted(gen_times,env.now)+1] # up to the first date not in the past
+                sizes=draw_payload_sizes(node,len(gen_times))
+                record_generations(node,gen_times,sizes,payload_hdr_size)
+                n_gen+=len(gen_times)
+                next_gen_time=float(gen_times[-1])
+                node.packet.dataPayloadSize=int(sizes[-1])
+
+    node.n_dropped+=n_gen-1
+    node.packet.setPacketType(dataPacketType)
+
+    return next_gen_time
 
 
 #
@@ -1089,42 +1384,10 @@ def transmit(env,node):
             if node.ca_state==schedule_tx:
                 ## scheduling a new generation
 
-                a_new_gen_has_been_done=False
-                while env.now>next_gen_time:
-                    # if we enter a second time here, we need to drop
-                    if a_new_gen_has_been_done:
-                        node.n_dropped+=1
-
-                    # produce next packet
-                    if experiment==6:
-                        #normally 9 nodes with 100ms delay between each node
-                        inter_gen_delay=node.cycle*node.period-env.now+node.nodeid*100
-                    elif experiment==7:
-                        #normally 5 nodes with 500ms delay between each node
-                        inter_gen_delay=node.cycle*node.period-env.now+node.nodeid*500            
-                    else:
-                        if node.distrib==perioDistribType:
-                            inter_gen_delay=node.period
-                        if node.distrib==expoDistribType:
-                            inter_gen_delay = rng.exponential(float(node.period))
-                            # transmit_wait = rng.expovariate(1.0/float(node.period))
-                        if node.distrib==uniformDistribType:
-                            inter_gen_delay = rng.uniform(max(2000,node.period-5000),node.period+5000)        
-                    
-                    ### randomize first generation for each node... Not a great impact 
-                    if shuffle_start and next_gen_time==-1:
-                        next_gen_time+=rng.uniform(0,node.period)
-                    next_gen_time+=inter_gen_delay
-                    node.gen_times.append(next_gen_time)
-                    a_new_gen_has_been_done=True
-
-                    # pick a random size
-                    node.packet.setDataPayloadSize()
-                    node.packet.setPacketType(dataPacketType)                
-
-                    node.cycle = node.cycle + 1
-                    nrScheduled += 1
-                    node.n_payload_gen += node.packet.dataPayloadSize - CANL_data_hdr_size
+                next_gen_time=generate_traffic(env,node,next_gen_time,payload_hdr_size=CANL_data_hdr_size)
+                if next_gen_time is None: # traffic trace exhausted
+                    endSim=max(endSim,env.now)
+                    return
 
                 # initiate backoff and change state
                 node.Wbusy_BE=Wbusy_BE
@@ -1162,7 +1425,7 @@ def transmit(env,node):
                     
                     if CANL22_P!=0:
                         #determine if the node transmits data right after RTS or after a listen 2 phase
-                        node.my_P=rng.integers(0,101)
+                        node.my_P=backoff_rng.integers(0,101)
 
                     # CAD before LISTEN, optional, default not applied
                     channel_found_busy=False                    
@@ -1183,8 +1446,10 @@ def transmit(env,node):
                         node.nav+=1         
                         #will go into NAV
                         node.ca_state=CANL_NAV_state  
+                        if log_events:
+                            MainTrace.record(env.now,node.nodeid,event_trace.NAV_START)
                         
-                        node.backoff=rng.integers(CANL_backoff_min,CANL_backoff_max+1)# 64 == 2**Wbusy_maxBE
+                        node.backoff=backoff_rng.integers(CANL_backoff_min,CANL_backoff_max+1)# 64 == 2**Wbusy_maxBE
                         yield env.timeout( node.backoff*node.packet.Tpream)
 
                     else: # go listen mode, then
@@ -1205,14 +1470,14 @@ def transmit(env,node):
                             CANL_win_max=max(CANL22_L1_min,CANL22_L1_MAX-CANL22_fair_factor*(n_retry-node.n_retry))
 
                         # compute listen window
-                        listen_time=rng.integers(
+                        listen_time=backoff_rng.integers(
                             CANL22_L1_min, 
                             CANL_win_max+1
                             )*node.packet.Tpream #+node.packet.rectime#+.131
 
                         node.ca_listen_end_time=env.now+listen_time
                         if log_events:
-                            MainLogger.info((node.nodeid,"lis1_start",env.now))
+                            MainTrace.record(env.now,node.nodeid,event_trace.LIS1_START)
                         yield env.timeout(listen_time)
 
             #############################################################
@@ -1232,7 +1497,7 @@ def transmit(env,node):
             #### WE stopped listening earlier! 
             if node.ca_state==CANL_listen1 and node.listened_time!=-1:
                 if log_events:
-                    MainLogger.info((node.nodeid,"lis1_stop",node.ca_listen_start_time+node.listened_time))
+                    MainTrace.record(node.ca_listen_start_time+node.listened_time,node.nodeid,event_trace.LIS1_STOP)
                 node.total_listen_time = node.total_listen_time + node.listened_time
                 
                 #did we receive a DATA with a ValidHeader?
@@ -1245,6 +1510,8 @@ def transmit(env,node):
                     #will go into NAV
                     node.nav+=1         
                     node.ca_state=CANL_NAV_state                
+                    if log_events:
+                        MainTrace.record(env.now,node.nodeid,event_trace.NAV_START)
 
                     #it can happen that the end of the listening period is after the theoretical NAV period    for data packet
                     #in this case, it is not really possible to revert time and the end of the listening period will be the end of the nav period
@@ -1271,6 +1538,8 @@ def transmit(env,node):
                     #go into NAV
                     node.nav+=1         
                     node.ca_state=CANL_NAV_state            
+                    if log_events:
+                        MainTrace.record(env.now,node.nodeid,event_trace.NAV_START)
                     yield env.timeout(nav_period)
 
                 elif node.I_heard_preamble:
@@ -1279,6 +1548,8 @@ def transmit(env,node):
                     #will go into NAV
                     node.nav+=1         
                     node.ca_state=CANL_NAV_state                
+                    if log_events:
+                        MainTrace.record(env.now,node.nodeid,event_trace.NAV_START)
 
                     overtime_listening=max(0,(env.now-node.ca_listen_start_time)-node.listened_time)
                     if overtime_listening>0:
@@ -1307,16 +1578,20 @@ def transmit(env,node):
                                 packetsOnAir.append(node)
                                 node.packet.addTime = env.now
                             if log_events:
-                                MainLogger.info((node.nodeid,"TX_start",env.now))
+                                MainTrace.record(env.now,node.nodeid,event_trace.TX_START)
 
 
                         channel_busy_rts[node.nodeid]=True
-                        channel_log.append((env.now,node.packet.rectime,node.nodeid,node.cycle))
+                        tx_start=env.now
+                        account_channel_busy(tx_start,node.packet.rectime)
+                        if keep_chan_log:
+                            channel_log.append((tx_start,node.packet.rectime,node.nodeid,node.cycle))
                         # print(node.nodeid,packetsOnAir,file=sys.stderr)
                         yield env.timeout(node.packet.rectime)
+                        account_tx_time(node,tx_start,node.packet.rectime)
                         channel_busy_rts[node.nodeid]=False
                         if log_events:
-                            MainLogger.info((node.nodeid,"TX_stop",env.now))
+                            MainTrace.record(env.now,node.nodeid,event_trace.TX_STOP)
                         
                         if node.packet.lost:
                             nrRTSLost += 1
@@ -1357,6 +1632,8 @@ def transmit(env,node):
             ###########################################################
             if node.ca_state==CANL_NAV_state:
                 #we arrive at the end of the nav period
+                if log_events:
+                    MainTrace.record(env.now,node.nodeid,event_trace.NAV_STOP)
                 #so we try again from the beginning of the CANL22 procedure
                 node.ca_state=want_transmit
                 node.packet.setPacketType(dataPacketType)
@@ -1376,7 +1653,7 @@ def transmit(env,node):
                     #store time at which listening period began
                     node.ca_listen_start_time=env.now
                     if log_events:
-                        MainLogger.info((node.nodeid,"lis2_start",env.now))
+                        MainTrace.record(env.now,node.nodeid,event_trace.LIS2_START)
 
                     node.start_listening()
 
@@ -1391,7 +1668,7 @@ def transmit(env,node):
             #### WE stopped listening earlier! See node.listened_time==-1 ###
             if node.ca_state==CANL_listen2 and node.listened_time!=-1:
                 if log_events:
-                    MainLogger.info((node.nodeid,"lis2_stop",node.ca_listen_start_time+node.listened_time))
+                    MainTrace.record(node.ca_listen_start_time+node.listened_time,node.nodeid,event_trace.LIS2_STOP)
                 node.total_listen_time = node.total_listen_time + node.listened_time
 
                 #did we receive a DATA with a ValidHeader?
@@ -1404,6 +1681,8 @@ def transmit(env,node):
                     #will go into NAV
                     node.nav+=1         
                     node.ca_state=CANL_NAV_state
+                    if log_events:
+                        MainTrace.record(env.now,node.nodeid,event_trace.NAV_START)
 
                     if node.ca_listen_start_time+node.listened_time+nav_period <= env.now:
                         #in this case, there is no additional delay, we just go to start_nav
@@ -1428,6 +1707,8 @@ def transmit(env,node):
                     #go into NAV
                     node.nav+=1         
                     node.ca_state=CANL_NAV_state            
+                    if log_events:
+                        MainTrace.record(env.now,node.nodeid,event_trace.NAV_START)
                     yield env.timeout(nav_period)
 
 
@@ -1437,6 +1718,8 @@ def transmit(env,node):
                     #will go into NAV
                     node.nav+=1         
                     node.ca_state=CANL_NAV_state                
+                    if log_events:
+                        MainTrace.record(env.now,node.nodeid,event_trace.NAV_START)
 
                     overtime_listening=max(0,(env.now-node.ca_listen_start_time)-node.listened_time)
                     if overtime_listening>0:
@@ -1486,16 +1769,20 @@ def transmit(env,node):
                         packetsOnAir.append(node)
                         node.packet.addTime = env.now
                     if log_events:
-                        MainLogger.info((node.nodeid,"TX_start",env.now))
+                        MainTrace.record(env.now,node.nodeid,event_trace.TX_START)
 
 
                 channel_busy_data[node.nodeid]=True
-                channel_log.append((env.now,node.packet.rectime,node.nodeid,node.cycle))
+                tx_start=env.now
+                account_channel_busy(tx_start,node.packet.rectime)
+                if keep_chan_log:
+                    channel_log.append((tx_start,node.packet.rectime,node.nodeid,node.cycle))
                 # print(node.nodeid,packetsOnAir,file=sys.stderr)
                 yield env.timeout(node.packet.rectime)
+                account_tx_time(node,tx_start,node.packet.rectime)
                 channel_busy_data[node.nodeid]=False
                 if log_events:
-                    MainLogger.info((node.nodeid,"TX_stop",env.now))
+                    MainTrace.record(env.now,node.nodeid,event_trace.TX_STOP)
                     
                 if node.packet.lost:
                     nrLost += 1
@@ -1545,44 +1832,10 @@ def transmit(env,node):
             # schedule_tx -> want_transmit                            #
             ###########################################################
             if node.ca_state==schedule_tx:
-                a_new_gen_has_been_done=False
-                while env.now>next_gen_time:
-
-                    # if we enter a second time here, we need to drop
-                    if a_new_gen_has_been_done:
-                        node.n_dropped+=1
-
-                    # last_gen_time=next_gen_time
-
-                    # produce next packet
-                    if experiment==6:
-                        #normally 9 nodes with 100ms delay between each node
-                        inter_gen_delay=node.cycle*node.period-env.now+node.nodeid*100
-                    elif experiment==7:
-                        #normally 5 nodes with 500ms delay between each node
-                        inter_gen_delay=node.cycle*node.period-env.now+node.nodeid*500            
-                    else:
-                        if node.distrib==perioDistribType:
-                            inter_gen_delay=node.period
-                        if node.distrib==expoDistribType:
-                            inter_gen_delay = rng.exponential(float(node.period))
-                            # transmit_wait = rng.expovariate(1.0/float(node.period))
-                        if node.distrib==uniformDistribType:
-                            inter_gen_delay = rng.uniform(max(2000,node.period-5000),node.period+5000)        
-                    
-                    # next_gen_time=last_gen_time+inter_gen_delay
-                    if shuffle_start and next_gen_time==-1:
-                        next_gen_time+=rng.uniform(0,node.period)
-                    next_gen_time+=inter_gen_delay
-                    node.gen_times.append(next_gen_time)
-                    a_new_gen_has_been_done=True
-
-                    node.packet.setDataPayloadSize()
-                    node.packet.setPacketType(dataPacketType)                
-
-                    node.cycle = node.cycle + 1
-                    nrScheduled += 1
-                    node.n_payload_gen += node.packet.dataPayloadSize 
+                next_gen_time=generate_traffic(env,node,next_gen_time)
+                if next_gen_time is None: # traffic trace exhausted
+                    endSim=max(endSim,env.now)
+                    return
                 
                 node.ca_state=want_transmit
                 
@@ -1640,16 +1893,20 @@ def transmit(env,node):
                         packetsOnAir.append(node)
                         node.packet.addTime = env.now
                     if log_events:
-                        MainLogger.info((node.nodeid,"TX_start",env.now))
+                        MainTrace.record(env.now,node.nodeid,event_trace.TX_START)
 
 
                 channel_busy_data[node.nodeid]=True
-                channel_log.append((env.now,node.packet.rectime,node.nodeid,node.cycle))
+                tx_start=env.now
+                account_channel_busy(tx_start,node.packet.rectime)
+                if keep_chan_log:
+                    channel_log.append((tx_start,node.packet.rectime,node.nodeid,node.cycle))
                 # print(node.nodeid,packetsOnAir,file=sys.stderr)
                 yield env.timeout(node.packet.rectime)
+                account_tx_time(node,tx_start,node.packet.rectime)
                 channel_busy_data[node.nodeid]=False
                 if log_events:
-                    MainLogger.info((node.nodeid,"TX_stop",env.now))
+                    MainTrace.record(env.now,node.nodeid,event_trace.TX_STOP)
                     
                 if node.packet.lost:
                     nrLost += 1
@@ -1692,41 +1949,10 @@ def transmit(env,node):
         else:
             # Schedule next tx
             #########################################################################
-            a_new_gen_has_been_done=False
-            while env.now>next_gen_time:
-
-                # if we enter a second time here, we need to drop
-                if a_new_gen_has_been_done:
-                    node.n_dropped+=1
-
-                # produce next packet
-                if experiment==6:
-                    #normally 9 nodes with 100ms delay between each node
-                    inter_gen_delay=node.cycle*node.period-env.now+node.nodeid*100
-                elif experiment==7:
-                    #normally 5 nodes with 500ms delay between each node
-                    inter_gen_delay=node.cycle*node.period-env.now+node.nodeid*500            
-                else:
-                    if node.distrib==perioDistribType:
-                        inter_gen_delay=node.period
-                    if node.distrib==expoDistribType:
-                        inter_gen_delay = rng.exponential(float(node.period))
-                        # transmit_wait = rng.expovariate(1.0/float(node.period))
-                    if node.distrib==uniformDistribType:
-                        inter_gen_delay = rng.uniform(max(2000,node.period-5000),node.period+5000)        
-                
-                if shuffle_start and next_gen_time==-1:
-                    next_gen_time+=rng.uniform(0,node.period)                
-                next_gen_time+=inter_gen_delay
-                node.gen_times.append(next_gen_time)
-                a_new_gen_has_been_done=True
-
-                node.packet.setDataPayloadSize()
-                node.packet.setPacketType(dataPacketType)                
-
-                node.cycle = node.cycle + 1
-                nrScheduled += 1
-                node.n_payload_gen += node.packet.dataPayloadSize
+            next_gen_time=generate_traffic(env,node,next_gen_time)
+            if next_gen_time is None: # traffic trace exhausted
+                endSim=max(endSim,env.now)
+                return
             
             
             transmit_wait=next_gen_time - env.now
@@ -1761,7 +1987,7 @@ def transmit(env,node):
                 if channel_found_busy:
                     #here we just delay by a random backoff timer to retry again
                     #random backoff [Wbusy_min,2**Wbusy_BE]
-                    node.backoff=rng.integers(Wbusy_min,2**node.Wbusy_BE+1)
+                    node.backoff=backoff_rng.integers(Wbusy_min,2**node.Wbusy_BE+1)
                     if Wbusy_exp_backoff:
                         if node.Wbusy_BE<Wbusy_maxBE:
                             node.Wbusy_BE=node.Wbusy_BE + 1
@@ -1802,15 +2028,19 @@ def transmit(env,node):
                         packetsOnAir.append(node)
                         node.packet.addTime = env.now
                     if log_events:
-                        MainLogger.info((node.nodeid,"TX_start",env.now))
+                        MainTrace.record(env.now,node.nodeid,event_trace.TX_START)
 
 
                 channel_busy_data[node.nodeid]=True
-                channel_log.append((env.now,node.packet.rectime,node.nodeid,node.cycle))
+                tx_start=env.now
+                account_channel_busy(tx_start,node.packet.rectime)
+                if keep_chan_log:
+                    channel_log.append((tx_start,node.packet.rectime,node.nodeid,node.cycle))
                 yield env.timeout(node.packet.rectime)
+                account_tx_time(node,tx_start,node.packet.rectime)
                 channel_busy_data[node.nodeid]=False
                 if log_events:
-                    MainLogger.info((node.nodeid,"TX_stop",env.now))
+                    MainTrace.record(env.now,node.nodeid,event_trace.TX_STOP)
         
                 if node.packet.lost:
                     nrLost += 1
@@ -1907,6 +2137,17 @@ def main_with_params(params):
     global targetSchedPacket # number of packets tried in simulation. nb of packet to be sent per node. #targetSentPacket*nrNodes will be the target total number of scheduled packets before we exit simulation    
     global distribType      # type of traffic (#the selected distribution)
     global shuffle_start    # add a random uniform node.period before starting
+    global pregen_traffic   # if True, each node draws its generation dates and payload sizes by vectorized blocks, consumed by index
+    global pregen_block_size # number of generations drawn per block, sized from targetSchedPacket
+    # the module rng draws everything when params["seed"] is not given,
+    # with params["seed"] (an int, or {"entropy":int,"spawn_key":[int,...]} for a numpy SeedSequence child, see sweep.py),
+    # each stream of RNG_STREAMS gets its own generator, spawned from the seed in this order
+    global traffic_rng,channel_rng,cad_rng,backoff_rng
+    global crn      # common random numbers: each node draws its generations/payload sizes and its channel (PHY settings, path loss exponents, noise, fading)
+                    # from its own streams, seeded independently of the protocol, so that protocols compared with the same seed see the same traffic and channel
+                    # needs a seed, implies pregen_traffic (generations do not depend on the simulated timing)
+    global node_traffic_rngs,node_channel_rngs # per node streams (with crn), or traffic_rng/channel_rng for every node
+    global traffic_trace_file # if set, path of a .npy/.npz trace (see traffic_trace.py) giving per node generation dates and payload sizes, instead of the distributions
 
             ######### Simulation properties ################
     # experiments:
@@ -1927,14 +2168,30 @@ def main_with_params(params):
     global rayleigh_mean_dB        # mean of uncorrected rayleigh distribution. np.sqrt(2 / np.pi)*mean is then the "scale" or "mode" parameter.
 
     # global simtime
-    global MainLogger,log_events # a node level event logger, very verbose !!!! set to False by default, around (2e6 lines, 100MB)/simu
-    global keep_chan_log # same idea, but this boolean choose if you keep it in disk (in res dict), otherwise weeped out of RAM at end of simu
+    global MainTrace,log_events # a node level event trace, very verbose !!!! set to False by default, binary records in params["trace_dir"], results/<start_time>_trace by default (see event_trace.py)
+    # runs sharing a start_time (e.g. a sweep, see sweep.run_sweep) need one trace_dir each, a new trace replaces the former one
+    # trace filters: simulated time windows [(start,stop),...] (e.g. the timeline_tuples periods), node ids ("GW" or -1 for the GW), event names (see event_trace.EVENT_NAMES)
+    # log_events is switched on only within the windows, the node/event filters are lookup tables of the trace
+    global keep_chan_log # same idea, but this boolean choose if you keep it in disk (in res dict), otherwise not stored at all
     global keep_Global_TT_IGTs # also a huge list to be kept or not, the network inter gen time 
+    global gen_times_buf    # with keep_Global_TT_IGTs, dates of all the generations, in a numpy array filled up to n_gen_times
+    global n_gen_times
+    global pending_gen_times # otherwise, dates not yet merged in the network IGT counts (see merge_network_IGTs())
+    global merged_gen_time  # last merged date (None before the first)
+    global n_net_IGTs       # number of network IGTs merged
+    global n_short_net_IGTs # number of those shorter than 1s
+    global next_IGT_merge   # number of pending dates triggering a merge
             ######### Topological properties ################
     # max distance: 300m in city, 3000 m outside (5 km Utz experiment)
     # also more unit-disc like according to Utz
     global maxDist          # max dist GW device considered when building topology. defaults to sensitivity threshold.
-    global distance_matrix  # numpy array with distances between devs
+    global distance_matrix  # numpy array with distances between devs, at scale 1 (times topo_scale for the actual distances)
+    global log_distance_matrix  # log10(distance_matrix/d0), at scale 1 (plus log_topo_scale)
+    global topo_scale       # scale factor of the topology
+    global log_topo_scale   # log10(topo_scale)
+    # params["matrices"]: {"distance":path,"log_distance":path} of .npy files of these matrices (see build_path_loss_matrices),
+    # for at least nrNodes devices, built once for a sweep and memory-mapped read-only: the pages are shared by all the workers
+    # (see sweep.py). Otherwise taken from the matrices of the topology cached in this process (see get_base_matrices).
     # base station placement
     global bsx              # gw x coord
     global bsy              # gw y coord
@@ -1983,7 +2240,11 @@ def main_with_params(params):
     global channel_busy_rts
     global channel_busy_data
     global packetsOnAir
-    global channel_log
+    global channel_log      # (start, toa, nodeid, cycle) of every transmission, only filled if keep_chan_log
+    global chan_busy_dur    # cumulated duration of the closed busy periods of the channel
+    global chan_first_start # start of the first transmission
+    global chan_busy_since  # start of the current busy period
+    global chan_busy_until  # end of the current busy period (latest end of a transmission)
             ######### Simu monitoring Vars ####################
     global lastDisplayTime  # print nprocessed packets only every 10000 and store time 
             ######### Simu stats on inter-transmit time Vars ####################
@@ -2007,7 +2268,13 @@ def main_with_params(params):
     global nrLost
     global nrRTSLost
     global nrScheduled
-    global powerCaptures
+    # power capture counters per receiver, indexed by nodeid, GW at index -1 (see count_power_check())
+    global pc_checks                    # number of pairwise power checks
+    global pc_sum_in_ears               # sum of the numbers of transmissions perceived at the check
+    global pc_max_in_ears
+    global pc_caps                      # number of checks with a capture
+    global pc_sum_in_ears_with_capture
+    global pc_max_capture_in_ears
 
             ######### Ideal Mechanism Vars ####################
     global ideal_latest_start,ideal_latest_time
@@ -2074,13 +2341,40 @@ def main_with_params(params):
     max_payload_size = 150
     targetSentPacket = 2000
     targetSentPacket = targetSentPacket * nrNodes
-    targetSchedPacket = 1000
+    targetSchedPacket = params["packets_per_node"] if "packets_per_node" in params else 1000 # shorter runs e.g. for benchmarks
     targetSchedPacket *= nrNodes
     # distribType=uniformDistribType
     # distribType=expoDistribType
     # distribType=perioDistribType
     distribType=expoDistribType if params["distrib"]=="expo" else uniformDistribType if params["distrib"]=="unif" else perioDistribType
     shuffle_start = params["shuffle_start"] if "shuffle_start" in params else False
+    seed = params["seed"] if "seed" in params else None
+    if seed is not None:
+        seed_seq = np.random.SeedSequence(seed["entropy"],spawn_key=seed["spawn_key"]) if isinstance(seed,dict) else np.random.SeedSequence(seed)
+        seed = {"entropy":seed_seq.entropy,"spawn_key":list(seed_seq.spawn_key)}
+        traffic_rng,channel_rng,cad_rng,backoff_rng = [np.random.default_rng(child) for child in seed_seq.spawn(len(RNG_STREAMS))]
+    else:
+        traffic_rng = channel_rng = cad_rng = backoff_rng = rng
+    crn = params["crn"] if "crn" in params else False
+    if crn:
+        if seed is None:
+            raise ValueError("common random numbers (crn) need a seed")
+        crn_traffic_seq,crn_channel_seq = seed_seq.spawn(2)
+        node_traffic_rngs = [np.random.default_rng(child) for child in crn_traffic_seq.spawn(nrNodes)]
+        node_channel_rngs = [np.random.default_rng(child) for child in crn_channel_seq.spawn(nrNodes)]
+    else:
+        node_traffic_rngs = [traffic_rng]*nrNodes
+        node_channel_rngs = [channel_rng]*nrNodes
+    pregen_traffic = (params["pregen_traffic"] if "pregen_traffic" in params else False) or crn
+    if params["experiment"] in [6,7]: # generations depend on the simulated time
+        pregen_traffic = False
+    pregen_block_size = int(1.1*targetSchedPacket/nrNodes)+1 # expected share of a node + 10% margin, refilled if needed
+    traffic_trace_file = params["traffic_trace"] if "traffic_trace" in params else None
+    if traffic_trace_file:
+        # memory-mapped read-only, once per process
+        trace = traffic_trace.load_traffic_trace(traffic_trace_file)
+        # the simulation ends when every node has sent its trace
+        targetSchedPacket = int(trace[2][min(nrNodes,len(trace[2])-1)])
             ######### Simulation properties ################
     experiment = params["experiment"]
     exp4SF=12
@@ -2126,17 +2420,45 @@ def main_with_params(params):
 
     # simtime = params["simtime"]
     log_events=params["log_events"]
+    # params["profile"]: counters and timers of the hot functions (see start_profiler), in res["profile"]
+    profile = params["profile"] if "profile" in params else False
     keep_chan_log = params["keep_chan_log"] if "keep_chan_log" in params else False
+    MainTrace = None
+    trace_windows = params["trace_windows"] if "trace_windows" in params else None
     if log_events:
-        MainLogger = load_main_logger(params["start_time"])
-        MainLogger.info("Started")
-        MainLogger.info('start_time:{0}'.format(params["start_time"]))
+        trace_nodes = params["trace_nodes"] if "trace_nodes" in params else None
+        if trace_nodes is not None:
+            trace_nodes = [event_trace.GW_ID if n=="GW" else n for n in trace_nodes]
+            if any(n!=event_trace.GW_ID and not 0<=n<nrNodes for n in trace_nodes):
+                raise ValueError("trace_nodes {0}: node ids are 0 to {1} (or \"GW\")".format(params["trace_nodes"],nrNodes-1))
+        trace_events = params["trace_events"] if "trace_events" in params else None
+        trace_dir = params["trace_dir"] if "trace_dir" in params else 'results/{0}_trace'.format(params["start_time"])
+        MainTrace = event_trace.EventTrace(
+            trace_dir,params["start_time"],
+            n_nodes=nrNodes,nodes=trace_nodes,events=trace_events,windows=trace_windows)
 
     keep_Global_TT_IGTs = params["keep_Global_TT_IGTs"] if "keep_Global_TT_IGTs" in params else False
-
-    this_topo=pickle.load(open('results/{0}_topos.dat'.format(params["start_time"]), 'rb'))[params["topo"]]
+    gen_times_buf = np.empty(targetSchedPacket+nrNodes+1) if keep_Global_TT_IGTs else None
+    n_gen_times = 0
+    pending_gen_times = [0.]
+    merged_gen_time = None
+    n_net_IGTs = 0
+    n_short_net_IGTs = 0
+    next_IGT_merge = IGT_MERGE_BLOCK
+
+    # params["topo"]: index of the topology in results/<start_time>_topos.dat (loaded once per process), or the topology dict itself
+    this_topo=topo_builder.get_topo(params)
+    # runs of fewer devices use the first ones (see nested_counts in topo_builder.build_topo)
+    if len(this_topo['nodes'])<nrNodes:
+        raise ValueError("topology of {0} devices for a run of {1}".format(len(this_topo['nodes']),nrNodes))
     maxDist=this_topo['maxDist']*params["topo_scale"]
-    distance_matrix=build_dist_mat(this_topo)*params["topo_scale"]
+    topo_scale=params["topo_scale"]
+    log_topo_scale=np.log10(topo_scale)
+    if "matrices" in params:
+        distance_matrix=np.asarray(np.load(params["matrices"]["distance"],mmap_mode='r'))[:nrNodes,:nrNodes]
+        log_distance_matrix=np.asarray(np.load(params["matrices"]["log_distance"],mmap_mode='r'))[:nrNodes,:nrNodes]
+    else:
+        distance_matrix,log_distance_matrix=get_base_matrices(this_topo,nrNodes)
     bsx = this_topo['GW']['bsx']*params["topo_scale"]
     bsy = this_topo['GW']['bsy']*params["topo_scale"]
     xmax = bsx + this_topo['maxDist']*params["topo_scale"] + 20*params["topo_scale"]
@@ -2185,6 +2507,10 @@ def main_with_params(params):
     channel_busy_data = [False]*nrNodes
     packetsOnAir = []
     channel_log = []
+    chan_busy_dur = 0
+    chan_first_start = -1
+    chan_busy_since = 0
+    chan_busy_until = 0
             ######### Simu monitoring Vars ####################
     lastDisplayTime=-1
             ######### Simu stats on inter-transmit time Vars ####################
@@ -2198,6 +2524,7 @@ def main_with_params(params):
     endSim=0
             ######### Simu components Vars ####################
     nodes = []
+    node_processes = [] # transmit() of every node, the simulation ends when they all have
             ######### Simu Stats Vars ####################
     nrCollisions = 0
     nrRTSCollisions = 0
@@ -2209,7 +2536,12 @@ def main_with_params(params):
     nrLost = 0
     nrRTSLost = 0
     nrScheduled = 0
-    powerCaptures = []
+    pc_checks = [0]*(nrNodes+1)
+    pc_sum_in_ears = [0]*(nrNodes+1)
+    pc_max_in_ears = [0]*(nrNodes+1)
+    pc_caps = [0]*(nrNodes+1)
+    pc_sum_in_ears_with_capture = [0]*(nrNodes+1)
+    pc_max_capture_in_ears = [0]*(nrNodes+1)
             ######### Ideal Mechanism Vars ####################
     ideal_latest_start = 0
     ideal_latest_time = 0
@@ -2246,9 +2578,20 @@ def main_with_params(params):
             this_topo['nodes'][i]['y']*params["topo_scale"], 
             endDeviceType, bsId, avgSendTime, distribType, packetLength)
 
+        if traffic_trace_file:
+            node.traffic_gen_times,node.traffic_sizes=traffic_trace.node_traffic(trace,i)
+            if CANL22: #depends on scenario, data length included in header or in data...
+                node.traffic_size_offset=CANL_data_hdr_size
+
         nodes.append(node)
-        env.process(transmit(env,node))    
+        node_processes.append(env.process(transmit(env,node)))
         # print("-----------------------------------------------------------------------------------------------")
+
+    # end of the simulation: when no event is left, or when all the nodes are done if other processes go on
+    sim_end = None
+    if log_events and trace_windows is not None:
+        env.process(trace_window_switch(env,trace_windows))
+        sim_end = env.all_of(node_processes)
     
     this_topo=None
         
@@ -2261,10 +2604,19 @@ def main_with_params(params):
 
     # start simulation
     # env.run(until=simtime)
-    env.run()
+    if profile:
+        profiler=start_profiler(env)
+        run_start=time.perf_counter()
+        try:
+            env.run(until=sim_end)
+        finally:
+            profiler.restore()
+        run_time=time.perf_counter()-run_start
+    else:
+        env.run(until=sim_end)
 
-    if log_events:
-        close_logger_handlers(MainLogger)
+    if MainTrace is not None:
+        MainTrace.close()
 
     #########################
     ### POST SIMU ########
@@ -2313,18 +2665,10 @@ def main_with_params(params):
         node.CAD_energy=energy
         res["nodes"][node.nodeid]["energy_in_CAD_J"]=energy
 
-        ##### TIME in TX 
-        time_sending_data=0
-        start_sending_data=0
-        stop_sending_data=0
-        for cl in channel_log:
-            if cl[2]==node.nodeid:
-                if start_sending_data==0:
-                    start_sending_data=cl[0]
-                time_sending_data+=cl[1]        
-                stop_sending_data=cl[0]+cl[1]        
-        # print(time_sending_data,start_sending_data,stop_sending_data, file=sys.stderr)
-        # print(0/0)
+        ##### TIME in TX (accumulated along the simulation, see account_tx_time())
+        time_sending_data=node.tx_time
+        start_sending_data=node.first_tx_start
+        stop_sending_data=node.last_tx_stop
 
         #### ENERGY in TX
         energy = (time_sending_data * TX[int(node.packet.txpow)+2] * V) / 1e6
@@ -2390,7 +2734,11 @@ def main_with_params(params):
         "Wbusy_BE": Wbusy_BE,
         "Wbusy_maxBE": Wbusy_maxBE,
         "Wbusy_exp_backoff": Wbusy_exp_backoff,
-        "gaussian_noise":gaussian_noise
+        "gaussian_noise":gaussian_noise,
+        "pregen_traffic":pregen_traffic,
+        "traffic_trace":traffic_trace_file,
+        "seed":seed,
+        "crn":crn,
     }
 
 
@@ -2484,51 +2832,30 @@ def main_with_params(params):
 
     #### Newer things
 
-    TT_gen_times = [0]
-    TT_IGTs=[]
+    # inter-generation times, running statistics per node (see record_generations()) merged for the network
+    n_TT_IGT,mean_TT_IGT,M2_TT_IGT=0,0,0
     for n in nodes:
-        TT_gen_times+=n.gen_times[1:]
-        npks_gen=len(n.gen_times)
-        IGTs=[n.gen_times[i]-n.gen_times[i-1] for i in range(1,npks_gen)]
-        # print(npks_gen, IGTs, file=sys.stderr)
-        # print(0/0)
-        TT_IGTs+=IGTs
-    
-        res["nodes"][n.nodeid]["mean_IGT"] = np.mean(IGTs)
-        res["nodes"][n.nodeid]["std_dev_IGT"] = np.std(IGTs)
+        res["nodes"][n.nodeid]["mean_IGT"] = n.mean_IGT if n.n_IGT>0 else np.nan
+        res["nodes"][n.nodeid]["std_dev_IGT"] = math.sqrt(n.M2_IGT/n.n_IGT) if n.n_IGT>0 else np.nan
+        n_TT_IGT,mean_TT_IGT,M2_TT_IGT=merge_running_stats(n_TT_IGT,mean_TT_IGT,M2_TT_IGT,n.n_IGT,n.mean_IGT,n.M2_IGT)
 
-    res["TOTAL"]["mean_IGT"]=np.mean(TT_IGTs)
-    res["TOTAL"]["std_dev_IGT"]=np.std(TT_IGTs)
+    res["TOTAL"]["mean_IGT"]=mean_TT_IGT if n_TT_IGT>0 else np.nan
+    res["TOTAL"]["std_dev_IGT"]=math.sqrt(M2_TT_IGT/n_TT_IGT) if n_TT_IGT>0 else np.nan
 
-    # TT_gen_times=sorted(
-    TT_gen_times.sort()
-    npks_gen=len(TT_gen_times)
-    Global_TT_IGTs=[TT_gen_times[i]-TT_gen_times[i-1] for i in range(1,npks_gen)]
+    # network inter-generation times, all the dates sorted (with 0)
     if keep_Global_TT_IGTs:
-        res["TOTAL"]["Global_TT_IGTs"]=Global_TT_IGTs
-    # else:
-    res["TOTAL"]["short_IGTs"]=np.count_nonzero(np.array(Global_TT_IGTs)<1000)/len(Global_TT_IGTs)
+        TT_gen_times=np.sort(np.append(gen_times_buf[:n_gen_times],0))
+        Global_TT_IGTs=np.diff(TT_gen_times)
+        res["TOTAL"]["Global_TT_IGTs"]=Global_TT_IGTs.tolist()
+        res["TOTAL"]["short_IGTs"]=np.count_nonzero(Global_TT_IGTs<1000)/len(Global_TT_IGTs)
+    else:
+        merge_network_IGTs(np.inf)
+        res["TOTAL"]["short_IGTs"]=n_short_net_IGTs/n_net_IGTs
 
-    # channel_log_sorted=sorted(channel_log, key=lambda tup: tup[0])
-    channel_log.sort(key=lambda tup: tup[0])
-    
-    busy_dur=0
-    busy_start=channel_log[0][0]
-    busy_stop=max([channel_log[i][0]+channel_log[i][1] for i in range(len(channel_log))])
-    last_previous_end=channel_log[0][0]+channel_log[0][1]
-    prev_tx_id=0
-    for tx_id in range(1,len(channel_log)):
-        tx=channel_log[tx_id]
-        prev_tx=channel_log[prev_tx_id]
-        if (tx[0]<last_previous_end): #starts before end of previous 
-            if (tx[0]+tx[1]>last_previous_end) : #ends after end of previous 
-                busy_dur += (tx[0]+tx[1]) - (prev_tx[0]+prev_tx[1])
-                last_previous_end=tx[0]+tx[1]
-                prev_tx_id=tx_id
-        else:
-            busy_dur += tx[1]
-            last_previous_end=tx[0]+tx[1]
-            prev_tx_id=tx_id
+    # channel occupation, accumulated along the simulation (see account_channel_busy()), + the last busy period 
+    busy_dur=chan_busy_dur+chan_busy_until-chan_busy_since
+    busy_start=chan_first_start
+    busy_stop=chan_busy_until
 
     res["TOTAL"]["channel_occupation"]=busy_dur/(busy_stop-busy_start)
 
@@ -2540,42 +2867,22 @@ def main_with_params(params):
     if keep_chan_log:
         res["TOTAL"]["chanlog"]=channel_log
 
-    powerChecks=0#len(powerCaptures)
-    # print(powerChecks, "powerChecks", file=sys.stderr)
-    
-    nb_caps=0
-    sum_in_ears=0
-    max_gw_in_ears=0
-    sum_in_ears_with_capture=0
+    # power captures, counted along the simulation (see count_power_check())
+    powerChecks=pc_checks[-1]
+    nb_caps=pc_caps[-1]
+    sum_in_ears=pc_sum_in_ears[-1]
+    max_gw_in_ears=pc_max_in_ears[-1]
+    sum_in_ears_with_capture=pc_sum_in_ears_with_capture[-1]
 
     for n in nodes:
-        res["nodes"][n.nodeid]["sum_in_ears"]=0
-        res["nodes"][n.nodeid]["nb_caps"]=0
-        res["nodes"][n.nodeid]["sum_in_ears_with_capture"]=0
-        res["nodes"][n.nodeid]["powerChecks"]=0
-
-        res["nodes"][n.nodeid]["max_overlap_degree"]=0
-        res["nodes"][n.nodeid]["max_capture_overlap_degree"]=0
+        res["nodes"][n.nodeid]["sum_in_ears"]=pc_sum_in_ears[n.nodeid]
+        res["nodes"][n.nodeid]["nb_caps"]=pc_caps[n.nodeid]
+        res["nodes"][n.nodeid]["sum_in_ears_with_capture"]=pc_sum_in_ears_with_capture[n.nodeid]
+        res["nodes"][n.nodeid]["powerChecks"]=pc_checks[n.nodeid]
 
+        res["nodes"][n.nodeid]["max_overlap_degree"]=pc_max_in_ears[n.nodeid]
+        res["nodes"][n.nodeid]["max_capture_overlap_degree"]=pc_max_capture_in_ears[n.nodeid]
 
-    for pcheck in powerCaptures:
-        if pcheck[2]==-1:
-            powerChecks+=1
-            sum_in_ears+=pcheck[0]
-            max_gw_in_ears=max(max_gw_in_ears,pcheck[0])
-            if pcheck[1]:
-                nb_caps+=1
-                sum_in_ears_with_capture+=pcheck[0]
-
-        else:
-            res["nodes"][pcheck[2]]["sum_in_ears"]+=pcheck[0]
-            res["nodes"][pcheck[2]]["max_overlap_degree"]=max(res["nodes"][pcheck[2]]["max_overlap_degree"],pcheck[0])
-            res["nodes"][pcheck[2]]["powerChecks"]+=1
-            if pcheck[1]:
-                res["nodes"][pcheck[2]]["nb_caps"]+=1
-                res["nodes"][pcheck[2]]["sum_in_ears_with_capture"]+=pcheck[0]
-                res["nodes"][pcheck[2]]["max_capture_overlap_degree"]=max(res["nodes"][pcheck[2]]["max_capture_overlap_degree"],pcheck[0])
-    
 
     res["TOTAL"]["GW_power_capture_ratio"]=nb_caps/powerChecks if powerChecks>0 else 0
     res["TOTAL"]["GW_overlap_degree"]=sum_in_ears/powerChecks if powerChecks>0 else 0
@@ -2593,6 +2900,10 @@ def main_with_params(params):
     res["TOTAL"]["max_overlap_degree"]=sum(res["nodes"][n.nodeid]["max_overlap_degree"] for n in nodes)/nrNodes
     res["TOTAL"]["max_capture_overlap_degree"]=sum(res["nodes"][n.nodeid]["max_capture_overlap_degree"] for n in nodes)/nrNodes
 
+    if profile:
+        res["profile"]=profiler.report()
+        res["profile"]["run"]={"calls":1,"time_s":run_time,"mean_time_s":run_time}
+
 
         
     
@@ -2636,12 +2947,10 @@ def main_with_params(params):
 #
 if __name__ == '__main__':
 
-    # module for the genration of the topology
-    import topo_builder
-
-    import time
-    import json
+    import json_export
+    import results_store
     JSON_EXPORT = True
+    STORE_RESULTS = True # append the run to the columnar store results/<start_time>_store (see results_store.py)
 
     raw_start=time.localtime()
     start_time=time.strftime("%Y-%m-%d-%H-%M-%S", raw_start)
@@ -2744,8 +3053,11 @@ if __name__ == '__main__':
     pickle.dump(params, open('results/{0}_params.dat'.format(start_time), 'wb'))
     pickle.dump(res3, open('results/{0}_data.dat'.format(start_time), 'wb'))
 
+    if STORE_RESULTS:
+        store=results_store.ResultsStore('results/{0}_store'.format(start_time))
+        store.append(res3,params)
+        store.close()
+
     if JSON_EXPORT:
-        json_dict = json.dumps(res3, indent=4)
-        with open('results/{0}_results.json'.format(start_time), "w") as outfile:
-            outfile.write(json_dict)
+        json_export.dump(res3, 'results/{0}_results.json'.format(start_time))
 
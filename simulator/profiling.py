@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+######################### Hot path profiling for the LoRaSim3 Simulator ######################
+######################### https://github.com/Guillaumegaillard/CANL-LoRa #####################
+######################### unguaranteed public version ########################################
+
+# Counters and timers of the functions of a run, opt-in: with params["profile"], the simulator wraps its hot
+# functions (module functions, methods of its classes, the step of its SimPy environment) for the run only,
+# then restores them. Without it nothing is wrapped, and nothing is paid.
+# report() gives, per function:
+##   calls, time_s (wall time, inclusive of the instrumented functions it calls), mean_time_s,
+##   mean_<size> for a size taken at each call (e.g. mean_packetsOnAir)
+
+import time
+
+
+class Profiler():
+    def __init__(self):
+        self.stats={}
+        # (owner, name, whether the owner had the attribute itself, its former value)
+        self.patched=[]
+
+    # wrap owner.name (a function of a module, a method of a class, a method of an object)
+    ## size: optional function of the call arguments, a size averaged over the calls as mean_<size_name>
+    def instrument(self,owner,name,label=None,size=None,size_name=None):
+        original=getattr(owner,name)
+        label=label if label is not None else name
+        stat={"calls":0,"time_s":0.,"size":0}
+        self.stats[label]=(stat,size_name)
+        perf_counter=time.perf_counter
+
+        if size is None:
+            def wrapper(*args,**kwargs):
+                start=perf_counter()
+                try:
+                    return original(*args,**kwargs)
+                finally:
+                    stat["time_s"]+=perf_counter()-start
+                    stat["calls"]+=1
+        else:
+            def wrapper(*args,**kwargs):
+                stat["size"]+=size(*args,**kwargs)
+                start=perf_counter()
+                try:
+                    return original(*args,**kwargs)
+                finally:
+                    stat["time_s"]+=perf_counter()-start
+                    stat["calls"]+=1
+
+        self.patched.append((owner,name,name in vars(owner),vars(owner).get(name)))
+        setattr(owner,name,wrapper)
+
+    # put every wrapped function back
+    def restore(self):
+        for owner,name,had_it,former in reversed(self.patched):
+            if had_it:
+                setattr(owner,name,former)
+            else:
+                delattr(owner,name)
+        self.patched=[]
+
+    def report(self):
+        report={}
+        for label,(stat,size_name) in self.stats.items():
+            report[label]={
+                "calls":stat["calls"],
+                "time_s":stat["time_s"],
+                "mean_time_s":stat["time_s"]/stat["calls"] if stat["calls"]>0 else 0.,
+                }
+            if size_name is not None:
+                report[label]["mean_"+size_name]=stat["size"]/stat["calls"] if stat["calls"]>0 else 0.
+        return report
@@ -0,0 +1,583 @@
+# -*- coding: utf-8 -*-
+######################### Results store for the LoRaSim3 Simulator ###########################
+######################### https://github.com/Guillaumegaillard/CANL-LoRa #####################
+######################### unguaranteed public version ########################################
+
+# An append-only, columnar store of simulation results, one directory per sweep:
+##   <store_dir>/manifest.jsonl        one line per chunk: file, first run, number of runs, columns
+##   <store_dir>/chunk_00000.npz       uncompressed arrays, one member per column
+##   <store_dir>/runs.npy              the run index: one row per run, its scalar params, chunk and row in chunk
+# A chunk holds a few runs (a res dict returned by lorasim3.main_with_params, plus its params):
+##   "run"                      global index of the run in the store
+##   "params.<name>"            one value per run (sweep parameters and labels, e.g. "params.proto")
+##   "TOTAL.<key>"              one value per run
+##   "settings.<key>"           one value per run
+##   "nodes.<key>"              per node values, all runs of the chunk concatenated,
+##   "nodes.id"                 with the node ids,
+##   "nodes.offsets"            run i of the chunk owns [offsets[i],offsets[i+1])
+# Values that are lists (e.g. TOTAL Global_TT_IGTs) are kept ragged: "<col>" flat and "<col>.offsets".
+# Values that do not fit a numpy array (None, mixed types, keys absent from some runs) are kept as
+# JSON strings, an absent key as an empty string (read as None).
+# Chunks are written then declared in the manifest, so a crash loses at most the runs not yet flushed.
+# Reads (read_columns, read_run) open only the chunks and members they need.
+# select_runs() filters the run index, e.g. select_runs(load_run_index(store_dir),proto="CANL22_2/7",topo_scale=.5)
+# LazyResults indexes the pickles of a former sweep (<start_time>_data.dat, ...) once, then reads them lazily.
+
+import numpy as np
+import json
+import os
+import pickle
+
+import json_export
+
+
+# column kinds, as listed in the manifest
+SCALAR="scalar"
+RAGGED="ragged"
+JSON="json"
+
+# value of a key absent from a run
+MISSING=object()
+
+
+# a numpy array of *values*, or None if they do not fit one
+def as_column(values):
+    if any(v is None or v is MISSING or isinstance(v,(list,tuple,dict,np.ndarray)) for v in values):
+        return None
+    # numpy would turn numbers into strings
+    if any(isinstance(v,str) for v in values) and not all(isinstance(v,str) for v in values):
+        return None
+    column=np.asarray(values)
+    if column.dtype==object:
+        return None
+    return column
+
+
+# encode the values of a column into npz members, returns the kind of column
+## per node columns are not ragged (their offsets are nodes.offsets)
+def encode_column(name,values,members,ragged=True):
+    column=as_column(values)
+    if column is not None:
+        members[name]=column
+        return SCALAR
+
+    if ragged and all(isinstance(v,(list,tuple,np.ndarray)) for v in values):
+        flat=[np.asarray(v) for v in values]
+        if all(f.dtype!=object and f.ndim==1 for f in flat):
+            offsets=np.zeros(len(values)+1,dtype=np.int64)
+            offsets[1:]=np.cumsum([len(f) for f in flat])
+            members[name]=np.concatenate(flat) if len(flat)>0 else np.zeros(0)
+            members[name+".offsets"]=offsets
+            return RAGGED
+
+    members[name]=np.array(["" if v is MISSING else json_export.dumps(v) for v in values])
+    return JSON
+
+
+def decode_json(values):
+    return [json.loads(v) if v!="" else None for v in values]
+
+
+class ResultsStore():
+    # runs are buffered *chunk_size* at a time, then written as a chunk
+    def __init__(self,store_dir,chunk_size=16):
+        self.store_dir=store_dir
+        self.chunk_size=chunk_size
+        if not os.path.exists(store_dir):
+            os.makedirs(store_dir)
+
+        # resume an existing store
+        manifest=load_manifest(store_dir)
+        self.n_chunks=len(manifest)
+        self.n_runs=manifest[-1]["first_run"]+manifest[-1]["n_runs"] if len(manifest)>0 else 0
+
+        self.pending=[]
+
+    # add a run, *res* as returned by main_with_params, *params* its parameters and labels (e.g. proto)
+    def append(self,res,params):
+        self.pending.append((res,params))
+        if len(self.pending)>=self.chunk_size:
+            self.flush()
+        return self.n_runs+len(self.pending)-1
+
+    def flush(self):
+        if len(self.pending)==0:
+            return
+
+        members={}
+        columns={}
+        members["run"]=np.arange(self.n_runs,self.n_runs+len(self.pending))
+
+        for prefix,get in [("params",lambda run:run[1]),("TOTAL",lambda run:run[0]["TOTAL"]),("settings",lambda run:run[0]["settings"])]:
+            keys=[]
+            for run in self.pending:
+                keys+=[key for key in get(run) if key not in keys]
+            for key in keys:
+                name="{0}.{1}".format(prefix,key)
+                columns[name]=encode_column(name,[get(run).get(key,MISSING) for run in self.pending],members)
+
+        # per node values
+        node_ids=[]
+        node_values=[]
+        for res,params in self.pending:
+            for nodeid in res["nodes"]:
+                node_ids.append(nodeid)
+                node_values.append(res["nodes"][nodeid])
+        offsets=np.zeros(len(self.pending)+1,dtype=np.int64)
+        offsets[1:]=np.cumsum([len(res["nodes"]) for res,params in self.pending])
+        members["nodes.id"]=np.array(node_ids,dtype=np.int64)
+        members["nodes.offsets"]=offsets
+        keys=[]
+        for values in node_values:
+            keys+=[key for key in values if key not in keys]
+        for key in keys:
+            name="nodes.{0}".format(key)
+            columns[name]=encode_column(name,[values.get(key,MISSING) for values in node_values],members,ragged=False)
+
+        chunk_name="chunk_{0:05d}.npz".format(self.n_chunks)
+        tmp_path=os.path.join(self.store_dir,chunk_name+".tmp")
+        with open(tmp_path,"wb") as chunk_file:
+            np.savez(chunk_file,**members)
+        os.replace(tmp_path,os.path.join(self.store_dir,chunk_name))
+
+        with open(os.path.join(self.store_dir,"manifest.jsonl"),"a") as manifest_file:
+            manifest_file.write(json.dumps({
+                "chunk":chunk_name,
+                "first_run":self.n_runs,
+                "n_runs":len(self.pending),
+                "columns":columns,
+                })+"\n")
+
+        self.update_run_index()
+
+        self.n_chunks+=1
+        self.n_runs+=len(self.pending)
+        self.pending=[]
+
+    # add the pending runs to the run index (rewritten, params may differ from former runs)
+    def update_run_index(self):
+        index=load_run_index(self.store_dir)
+        names=[name for name in (index.dtype.names or []) if name not in ["run","chunk","row"]]
+        for res,params in self.pending:
+            names+=[name for name in params if name not in names]
+
+        columns={
+            "run":np.append(index["run"] if len(index)>0 else [],np.arange(self.n_runs,self.n_runs+len(self.pending))).astype(np.int64),
+            "chunk":np.append(index["chunk"] if len(index)>0 else [],np.full(len(self.pending),self.n_chunks)).astype(np.int32),
+            "row":np.append(index["row"] if len(index)>0 else [],np.arange(len(self.pending))).astype(np.int32),
+            }
+        for name in names:
+            values=(index[name].tolist() if index.dtype.names is not None and name in index.dtype.names else [None]*len(index))
+            values+=[params.get(name) for res,params in self.pending]
+            column=index_column(values)
+            if column is not None:
+                columns[name]=column
+
+        run_index=np.zeros(len(columns["run"]),dtype=[(name,columns[name].dtype) for name in columns])
+        for name in columns:
+            run_index[name]=columns[name]
+        tmp_path=os.path.join(self.store_dir,"runs.npy.tmp")
+        with open(tmp_path,"wb") as index_file:
+            np.save(index_file,run_index)
+        os.replace(tmp_path,os.path.join(self.store_dir,"runs.npy"))
+
+    def close(self):
+        self.flush()
+
+
+# a column of the run index, absent values as NaN (numbers) or "" (strings), None if not a scalar param
+def index_column(values):
+    present=[v for v in values if v is not None]
+    column=as_column(present)
+    if column is None or len(present)==0:
+        return None
+    if len(present)==len(values):
+        return column
+    if column.dtype.kind in "biuf":
+        return np.array([np.nan if v is None else v for v in values],dtype=np.float64)
+    if column.dtype.kind=="U":
+        return np.array(["" if v is None else v for v in values])
+    return None
+
+
+def load_run_index(store_dir):
+    index_path=os.path.join(store_dir,"runs.npy")
+    if not os.path.exists(index_path):
+        return np.zeros(0,dtype=[("run","i8"),("chunk","i4"),("row","i4")])
+    return np.load(index_path)
+
+
+# runs of the index matching every condition, e.g. proto="CANL22_2/7", topo_scale=.5, avgSendTime=[60000,150000]
+## a condition is a value or a list of accepted values
+def select_runs(run_index,**conditions):
+    mask=np.ones(len(run_index),dtype=bool)
+    for name,accepted in conditions.items():
+        if name not in run_index.dtype.names:
+            raise KeyError("no param {0} in the run index".format(name))
+        if isinstance(accepted,(list,tuple,np.ndarray)):
+            mask&=np.isin(run_index[name],accepted)
+        else:
+            mask&=run_index[name]==accepted
+    return run_index["run"][mask]
+
+
+def load_manifest(store_dir):
+    manifest_path=os.path.join(store_dir,"manifest.jsonl")
+    if not os.path.exists(manifest_path):
+        return []
+    with open(manifest_path) as manifest_file:
+        return [json.loads(line) for line in manifest_file if line.strip()!=""]
+
+
+# the members of an opened chunk, each one read once
+class ChunkMembers(dict):
+    def __init__(self,npz):
+        self.npz=npz
+
+    def __missing__(self,name):
+        self[name]=self.npz[name]
+        return self[name]
+
+
+# the values of a column for the runs [start,stop) of an opened chunk (ChunkMembers)
+## scalar columns: an array, ragged/nodes columns: (flat array, offsets), json columns: a list
+def read_chunk_column(chunk,name,kind,start,stop):
+    if name.startswith("nodes.") and name!="nodes.offsets":
+        offsets=chunk["nodes.offsets"]
+        values=chunk[name][offsets[start]:offsets[stop]]
+        if kind==JSON:
+            values=decode_json(values)
+        return values,offsets[start:stop+1]-offsets[start]
+    if kind==RAGGED:
+        offsets=chunk[name+".offsets"]
+        return chunk[name][offsets[start]:offsets[stop]],offsets[start:stop+1]-offsets[start]
+    values=chunk[name][start:stop]
+    if kind==JSON:
+        return decode_json(values)
+    return values
+
+
+# the part of a column absent from a chunk (e.g. a key written by some protocols only): *n_runs* runs,
+## the nodes of *offsets* for nodes.* columns
+class MissingPart():
+    def __init__(self,n_runs,offsets=None):
+        self.n_runs=n_runs
+        self.offsets=offsets
+
+
+# the parts absent from some chunks, as absent values: NaN if the column is numeric elsewhere, None otherwise,
+## per run ragged columns as a list of per run lists (None for the absent runs)
+## template: a part of the column read from another chunk, for the kind of values if all parts are absent
+def fill_missing_parts(parts,template=None):
+    present=[part for part in parts if not isinstance(part,MissingPart)]
+    if len(present)==len(parts):
+        return parts
+    examples=present if len(present)>0 or template is None else [template]
+    values=[part[0] if isinstance(part,tuple) else part for part in examples]
+    numeric=len(values)>0 and all(isinstance(v,np.ndarray) and v.dtype.kind in "biuf" for v in values)
+    nodes_column=any(isinstance(part,MissingPart) and part.offsets is not None for part in parts)
+    per_run_ragged=not nodes_column and any(isinstance(part,tuple) for part in examples)
+    filled=[]
+    for part in parts:
+        if isinstance(part,MissingPart):
+            if nodes_column:
+                n_values=int(part.offsets[-1])
+                filled.append((np.full(n_values,np.nan) if numeric else [None]*n_values,part.offsets))
+            else:
+                filled.append(np.full(part.n_runs,np.nan) if numeric and not per_run_ragged else [None]*part.n_runs)
+        elif per_run_ragged and isinstance(part,tuple):
+            part_values,offsets=part
+            part_values=part_values if isinstance(part_values,list) else part_values.tolist()
+            filled.append([part_values[offsets[i]:offsets[i+1]] for i in range(len(offsets)-1)])
+        else:
+            filled.append(part)
+    return filled
+
+
+# concatenate the parts read from several chunks, see fill_missing_parts
+def join_parts(parts,template=None):
+    if len(parts)==0:
+        return np.zeros(0)
+    parts=fill_missing_parts(parts,template)
+    # a column stored as json in some chunks only (e.g. a None value) is returned as a list
+    if any(isinstance(part,list) or (isinstance(part,tuple) and isinstance(part[0],list)) for part in parts):
+        parts=[(part[0] if isinstance(part[0],list) else part[0].tolist(),part[1]) if isinstance(part,tuple)
+            else (part if isinstance(part,list) else part.tolist()) for part in parts]
+    if isinstance(parts[0],tuple):
+        offsets=[parts[0][1]]
+        for values,part_offsets in parts[1:]:
+            offsets.append(part_offsets[1:]+offsets[-1][-1])
+        values=[part[0] for part in parts]
+        values=sum(values,[]) if isinstance(values[0],list) else np.concatenate(values)
+        return values,np.concatenate(offsets)
+    if isinstance(parts[0],list):
+        return sum(parts,[])
+    return np.concatenate(parts)
+
+
+# the given columns for the runs *runs* (global indices, None for all), as {name:values}, see read_chunk_column
+## "nodes.id" gives the node ids of the nodes.* columns
+## a column absent from some chunks (e.g. nodes.sent_rts_packets, CANL22 only) reads NaN or None there, see fill_missing_parts
+def read_columns(store_dir,columns,runs=None):
+    manifest=load_manifest(store_dir)
+    for name in columns:
+        if name not in ["nodes.id","run"] and len(manifest)>0 and not any(name in entry["columns"] for entry in manifest):
+            raise KeyError("{0}: no column {1}".format(store_dir,name))
+    parts={name:[] for name in columns}
+    if runs is not None:
+        runs=np.asarray(runs)
+    for entry in manifest:
+        first,n_runs=entry["first_run"],entry["n_runs"]
+        if runs is None:
+            selected=np.arange(n_runs)
+        else:
+            selected=runs[(runs>=first)&(runs<first+n_runs)]-first
+            if len(selected)==0:
+                continue
+
+        with np.load(os.path.join(store_dir,entry["chunk"])) as npz:
+            chunk=ChunkMembers(npz)
+            for name in columns:
+                kind=SCALAR if name in ["nodes.id","run"] else entry["columns"].get(name)
+                # runs are read one contiguous range at a time
+                for start,stop in contiguous_ranges(selected):
+                    if kind is not None:
+                        parts[name].append(read_chunk_column(chunk,name,kind,start,stop))
+                    elif name.startswith("nodes."):
+                        offsets=chunk["nodes.offsets"]
+                        parts[name].append(MissingPart(stop-start,offsets[start:stop+1]-offsets[start]))
+                    else:
+                        parts[name].append(MissingPart(stop-start))
+
+    # columns absent from all the chunks read: the kind of values of the first chunk that has them
+    templates={}
+    for name in columns:
+        if len(parts[name])>0 and all(isinstance(part,MissingPart) for part in parts[name]):
+            entry=next(entry for entry in manifest if name in entry["columns"])
+            with np.load(os.path.join(store_dir,entry["chunk"])) as npz:
+                templates[name]=read_chunk_column(ChunkMembers(npz),name,entry["columns"][name],0,1)
+
+    return {name:join_parts(parts[name],templates.get(name)) for name in columns}
+
+
+# per chunk {"run":run ids, name:values} of one value per run columns (params/TOTAL/settings), for streamed reductions
+## JSON columns are returned as float arrays (None as NaN), columns absent from a chunk are omitted
+def iter_chunks(store_dir,columns):
+    for entry in load_manifest(store_dir):
+        with np.load(os.path.join(store_dir,entry["chunk"])) as npz:
+            part={"run":npz["run"]}
+            for name in columns:
+                kind=entry["columns"].get(name)
+                if kind==SCALAR:
+                    part[name]=npz[name]
+                elif kind==JSON:
+                    part[name]=np.array([np.nan if v is None else v for v in decode_json(npz[name])],dtype=np.float64)
+            yield part
+
+
+# sorted indices -> [(start,stop),...] of consecutive indices
+def contiguous_ranges(indices):
+    indices=np.sort(indices)
+    if len(indices)==0:
+        return []
+    breaks=np.flatnonzero(np.diff(indices)!=1)+1
+    starts=np.append(indices[0],indices[breaks])
+    stops=np.append(indices[breaks-1],indices[-1])+1
+    return list(zip(starts.tolist(),stops.tolist()))
+
+
+# run *i* of an opened chunk as a nested dict, as main_with_params returned it: {"TOTAL","settings","nodes"} plus "params"
+## fields: column names or prefixes ("TOTAL", "nodes.DER", ...) to read, None for all
+## keys absent from the run (MISSING values, columns absent from the chunk) are absent from the dict, as in the res
+def chunk_run(chunk,entry,i,fields=None):
+    res={"params":{},"TOTAL":{},"settings":{},"nodes":{}}
+    node_ids=chunk["nodes.id"][chunk["nodes.offsets"][i]:chunk["nodes.offsets"][i+1]].tolist()
+    for nodeid in node_ids:
+        res["nodes"][nodeid]={}
+    for name,kind in entry["columns"].items():
+        prefix,key=name.split(".",1)
+        if fields is not None and name not in fields and prefix not in fields:
+            continue
+        if prefix=="nodes":
+            values=chunk[name][chunk["nodes.offsets"][i]:chunk["nodes.offsets"][i+1]].tolist()
+            for nodeid,value in zip(node_ids,values):
+                if kind!=JSON:
+                    res["nodes"][nodeid][key]=value
+                elif value!="": # absent otherwise
+                    res["nodes"][nodeid][key]=json.loads(value)
+        elif kind==RAGGED:
+            res[prefix][key]=read_chunk_column(chunk,name,kind,i,i+1)[0].tolist()
+        elif kind==JSON:
+            value=chunk[name][i]
+            if value!="":
+                res[prefix][key]=json.loads(value)
+        else:
+            res[prefix][key]=chunk[name][i].item()
+    return res
+
+
+# a run as a nested dict, see chunk_run
+def read_run(store_dir,run,fields=None):
+    for entry in load_manifest(store_dir):
+        first,n_runs=entry["first_run"],entry["n_runs"]
+        if first<=run<first+n_runs:
+            with np.load(os.path.join(store_dir,entry["chunk"])) as npz:
+                return chunk_run(ChunkMembers(npz),entry,run-first,fields)
+    raise IndexError("{0}: no run {1}".format(store_dir,run))
+
+
+# the sweep of a <start_time>_config.dat, in the order of the runs of <start_time>_data.dat:
+## a list of params dicts, named as the params of lorasim3 plus "proto", the label of read_them.py
+def sweep_params(config):
+    n_repes=config["n_repes"]
+    tpkts=config["tpkts"]
+    scales=config["scales"]
+    n_Nodes_tab=config["n_Nodes_tab"]
+    n_retries=config["n_retries"]
+    protos=config["protos"]
+    pl_sizes=config["pl_sizes"] if "pl_sizes" in config else [(70,70)]
+    rayleigh_means=config["rayleigh_means"] if "rayleigh_means" in config else [1]
+    gamma_EDs=config["gamma_EDs"] if "gamma_EDs" in config else [3]
+
+    if len(protos)==1:
+        protos_list=["CANL22_{0}/{1}".format(config["CANL_lmins"][clmm_id],config["CANL_lmaxes"][clmm_id]) for clmm_id in range(len(config["CANL_lmaxes"]))]
+    else:
+        protos_list=[proto for proto in protos]
+
+    sweep=[]
+    nnodes=n_Nodes_tab[0]
+    for tpkt_id in range(len(tpkts)):
+        if len(n_Nodes_tab)>1:
+            nnodes=n_Nodes_tab[tpkt_id]
+        for scale in scales:
+            for n_retry in n_retries:
+                for pls in pl_sizes:
+                    for rlmean in rayleigh_means:
+                        for gamma_ED in gamma_EDs:
+                            for repe in range(n_repes):
+                                for proto in protos_list:
+                                    sweep.append({
+                                        "avgSendTime":tpkts[tpkt_id],
+                                        "nrNodes":nnodes,
+                                        "topo_scale":scale,
+                                        "n_retry":n_retry,
+                                        "dist_min_payload_size":pls[0],
+                                        "dist_max_payload_size":pls[1],
+                                        "rayleigh_mean_dB":rlmean,
+                                        "gamma_ED":gamma_ED,
+                                        "topo":repe,
+                                        "proto":proto,
+                                        })
+    return sweep
+
+
+# convert the <prefix>_data.dat pickle of a sweep (with its <prefix>_config.dat) into a store
+def convert_data_file(prefix,store_dir=None,chunk_size=16):
+    if store_dir is None:
+        store_dir="{0}_store".format(prefix)
+    with open("{0}_data.dat".format(prefix),"rb") as data_file:
+        data=pickle.load(data_file)
+    with open("{0}_config.dat".format(prefix),"rb") as config_file:
+        config=pickle.load(config_file)
+    sweep=sweep_params(config)
+    if len(sweep)!=len(data):
+        raise ValueError("{0}: {1} runs in data, {2} in the sweep of config".format(prefix,len(data),len(sweep)))
+
+    if os.path.exists(os.path.join(store_dir,"manifest.jsonl")):
+        raise ValueError("{0} already exists".format(store_dir))
+    store=ResultsStore(store_dir,chunk_size)
+    for res,params in zip(data,sweep):
+        store.append(res,params)
+    store.close()
+    return store_dir
+
+
+# split a <prefix>_topos.dat pickle into one pickle per topology, in <prefix>_topos/
+def split_topos_file(prefix,topos_dir=None):
+    if topos_dir is None:
+        topos_dir="{0}_topos".format(prefix)
+    with open("{0}_topos.dat".format(prefix),"rb") as topos_file:
+        topos=pickle.load(topos_file)
+    if not os.path.exists(topos_dir):
+        os.makedirs(topos_dir)
+    for repe in topos:
+        with open(os.path.join(topos_dir,"{0}.dat".format(repe)),"wb") as topo_file:
+            pickle.dump(topos[repe],topo_file)
+    # the index is written last: its presence means the split is complete
+    with open(os.path.join(topos_dir,"index.json"),"w") as index_file:
+        json.dump([repe for repe in topos],index_file)
+    return topos_dir
+
+
+# the results of a sweep <prefix>_data.dat/_config.dat/_topos.dat, read lazily:
+## the first opening converts them once into <prefix>_store and <prefix>_topos/,
+## then only the requested runs, fields and topologies are read
+class LazyResults():
+    def __init__(self,prefix):
+        self.prefix=prefix
+        self.store_dir="{0}_store".format(prefix)
+        self.topos_dir="{0}_topos".format(prefix)
+
+        if not os.path.exists(os.path.join(self.store_dir,"manifest.jsonl")):
+            convert_data_file(prefix,self.store_dir)
+        if not os.path.exists(os.path.join(self.topos_dir,"index.json")) and os.path.exists("{0}_topos.dat".format(prefix)):
+            split_topos_file(prefix,self.topos_dir)
+
+        with open("{0}_config.dat".format(prefix),"rb") as config_file:
+            self.config=pickle.load(config_file)
+        self.manifest=load_manifest(self.store_dir)
+        self.chunk_starts=np.array([entry["first_run"] for entry in self.manifest],dtype=np.int64)
+        self.n_runs=self.manifest[-1]["first_run"]+self.manifest[-1]["n_runs"] if len(self.manifest)>0 else 0
+        self.run_index=load_run_index(self.store_dir)
+
+        # the chunk last read, runs are often read in order
+        self.open_chunk_id=None
+        self.open_chunk=None
+
+        self.loaded_topos={}
+
+    def __len__(self):
+        return self.n_runs
+
+    # run *data_index* as a nested dict, see chunk_run
+    def run(self,data_index,fields=None):
+        if not 0<=data_index<self.n_runs:
+            raise IndexError("{0}: no run {1}".format(self.store_dir,data_index))
+        chunk_id=np.searchsorted(self.chunk_starts,data_index,side='right')-1
+        if chunk_id!=self.open_chunk_id:
+            self.close()
+            self.open_npz=np.load(os.path.join(self.store_dir,self.manifest[chunk_id]["chunk"]))
+            self.open_chunk=ChunkMembers(self.open_npz)
+            self.open_chunk_id=chunk_id
+        entry=self.manifest[chunk_id]
+        return chunk_run(self.open_chunk,entry,data_index-entry["first_run"],fields)
+
+    # run *data_index* as in the <prefix>_data.dat file, the res dict of lorasim3 (without the "params" of the store)
+    def res(self,data_index):
+        res=self.run(data_index)
+        del res["params"]
+        return res
+
+    # data indices of the runs matching the conditions, see select_runs
+    def select(self,**conditions):
+        return select_runs(self.run_index,**conditions)
+
+    # see read_columns
+    def columns(self,names,runs=None):
+        return read_columns(self.store_dir,names,runs)
+
+    def topo_ids(self):
+        with open(os.path.join(self.topos_dir,"index.json")) as index_file:
+            return json.load(index_file)
+
+    def topo(self,repe):
+        if repe not in self.loaded_topos:
+            with open(os.path.join(self.topos_dir,"{0}.dat".format(repe)),"rb") as topo_file:
+                self.loaded_topos[repe]=pickle.load(topo_file)
+        return self.loaded_topos[repe]
+
+    def close(self):
+        if self.open_chunk is not None:
+            self.open_npz.close()
+            self.open_chunk_id=None
+            self.open_chunk=None
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+######################### Run cache for the LoRaSim3 Simulator ###############################
+######################### https://github.com/Guillaumegaillard/CANL-LoRa #####################
+######################### unguaranteed public version ########################################
+
+# An on-disk cache of res dicts (as returned by lorasim3.main_with_params), content addressed:
+## key = sha256 of (normalized params, topology content, seed, salt)
+##   params: sorted, numbers compared by value (1 == 1.0), without the keys that do not change res
+##   topology: the topology dict itself, not its index in a _topos.dat file
+##   salt: invalidation key, by default a hash of the simulator sources (a change of the code
+##         invalidates every entry), or any string given explicitly
+## <cache_dir>/<key[:2]>/<key>.dat    the pickled res
+# A run without seed is not reproducible, it gets no key (None) and is never cached, nor is a traced or profiled run.
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+
+import numpy as np
+
+
+# params that do not change res
+NOT_KEYED=["start_time","topo","matrices","log_events","trace_dir","trace_windows","trace_nodes","trace_events"]
+
+# sources whose change invalidates the cache (default salt)
+SIMULATOR_SOURCES=["lorasim3.py","constants.py","traffic_trace.py"]
+
+
+def code_hash(sources=SIMULATOR_SOURCES):
+    digest=hashlib.sha256()
+    simulator_dir=os.path.dirname(os.path.abspath(__file__))
+    for source in sources:
+        with open(os.path.join(simulator_dir,source),"rb") as source_file:
+            digest.update(source_file.read())
+    return digest.hexdigest()
+
+
+# params as a canonical JSON-able value
+def normalize(value):
+    if isinstance(value,dict):
+        return {str(k):normalize(v) for k,v in sorted(value.items(),key=lambda item:str(item[0]))}
+    if isinstance(value,(list,tuple,np.ndarray)):
+        return [normalize(v) for v in value]
+    if isinstance(value,(bool,np.bool_)):
+        return bool(value)
+    if isinstance(value,(int,float,np.integer,np.floating)):
+        return repr(float(value))
+    return value
+
+
+def topo_hash(topo):
+    return hashlib.sha256(json.dumps(normalize(topo),sort_keys=True).encode()).hexdigest()
+
+
+class RunCache():
+    def __init__(self,cache_dir,salt=None):
+        self.cache_dir=cache_dir
+        self.salt=salt if salt is not None else code_hash()
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        # topology hashes, by id of the topology dict (topologies are shared by many runs)
+        self.topo_hashes={}
+
+    # key of a run, None if it is not reproducible
+    def key(self,params,topo,seed=None):
+        if seed is None:
+            seed=params.get("seed")
+        if seed is None or params.get("log_events") or params.get("profile"):
+            return None
+        if id(topo) not in self.topo_hashes:
+            self.topo_hashes[id(topo)]=(topo,topo_hash(topo)) # keep topo alive, its id stays valid
+
+        keyed={name:value for name,value in params.items() if name not in NOT_KEYED}
+        # a traffic trace is identified by its file
+        if keyed.get("traffic_trace"):
+            trace_stat=os.stat(keyed["traffic_trace"])
+            keyed["traffic_trace"]=[os.path.abspath(keyed["traffic_trace"]),trace_stat.st_size,trace_stat.st_mtime_ns]
+
+        content=json.dumps({
+            "params":normalize(keyed),
+            "topo":self.topo_hashes[id(topo)][1],
+            "seed":normalize(seed),
+            "salt":self.salt,
+            },sort_keys=True)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def path(self,key):
+        return os.path.join(self.cache_dir,key[:2],key+".dat")
+
+    # the cached res, or None
+    def get(self,key):
+        if key is None or not os.path.exists(self.path(key)):
+            return None
+        with open(self.path(key),"rb") as res_file:
+            return pickle.load(res_file)
+
+    def put(self,key,res):
+        if key is None:
+            return
+        path=self.path(key)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path),exist_ok=True)
+        tmp_path="{0}.{1}.tmp".format(path,os.getpid())
+        with open(tmp_path,"wb") as res_file:
+            pickle.dump(res,res_file)
+        os.replace(tmp_path,path)
+
+    # invalidation: drop every entry (entries of an other salt are otherwise just never hit again)
+    def clear(self):
+        shutil.rmtree(self.cache_dir)
+        os.makedirs(self.cache_dir)
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+######################### Sweeps of simulations for the LoRaSim3 Simulator ###################
+######################### https://github.com/Guillaumegaillard/CANL-LoRa #####################
+######################### unguaranteed public version ########################################
+
+# A sweep, as the ones of the paper: a config dict (saved as results/<start_time>_config.dat, keys as read by
+# results/read_them.py), n_repes topologies (results/<start_time>_topos.dat), and a run of lorasim3 for every
+# combination of tpkts (with n_Nodes_tab), scales, n_retries, pl_sizes, rayleigh_means, gamma_EDs, repetitions and protos,
+# in the order of results_store.sweep_params. Runs are appended to the store results/<start_time>_store.
+# A run of k devices simulates the first k devices of the topology of its repetition: the density curves of a
+# repetition share their devices. With config["nested_topos"], each of these prefixes is also spread as a topology
+# of k devices (see nested_counts in topo_builder.build_topo).
+# With config["seed"], runs and topologies are seeded by children of a numpy SeedSequence of this seed:
+##   topology of repetition r:  spawn_key (1,r)
+##   run:                       spawn_key (0,<4 words of a hash of its own params>)
+# (without the proto with config["crn"], common random numbers: see lorasim3)
+# so that a run depends neither on the rest of the sweep nor on the order or the process it is run in:
+# runs can be split among *workers* processes with identical results, and with a run cache (see run_cache.py),
+# adding a protocol or a scale to a sweep only simulates the new runs.
+# The distance and log-distance matrices of the devices (see lorasim3.build_path_loss_matrices) only depend on the
+# topology (scales offset them, runs with fewer devices use their upper left submatrices): they are built once per
+# topology of the sweep as .npy files of results/<start_time>_matrices, that the runs of every worker memory-map
+# read-only (the pages are shared, not copied per run or per process).
+# With config["log_events"], the event trace of run i of the store is results/<start_time>_trace/run_<i> (params["trace_dir"]).
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+import sys
+import multiprocessing
+
+import numpy as np
+
+import lorasim3
+import topo_builder
+import results_store
+import run_cache
+
+
+# protocols of the protos list, as params of lorasim3 ("CANL22_<lmin>/<lmax>" is CANL22 with these listen windows)
+PROTOCOLS={
+    "CANL22":{"CANL22":True,"ideal_FIFO":False},
+    "ideal_FIFO":{"CANL22":False,"ideal_FIFO":True},
+    "CAD+Backoff":{"CANL22":False,"ideal_FIFO":False,"with_CAD_and_back_off":True},
+    "ALOHA":{"CANL22":False,"ideal_FIFO":False,"with_CAD_and_back_off":False},
+}
+
+# params of every run of a sweep, unless given by the config or the sweep
+BASE_PARAMS={
+    "avgSendTime":1500000,
+    "distrib":"expo",
+    "n_retry":40,
+    "full_collision":True,
+    "gaussian_noise":True,
+    "powerCaptureThreshold":6,
+    "variablePayloadSize":True,
+    "normalPayloadSize":False,
+    "shuffle_start":False,
+    "rayleigh_fading":True,
+    "rayleigh_mean_dB":4,
+    "keep_chan_log":False,
+    "keep_Global_TT_IGTs":False,
+    "with_CAD_and_back_off":True,
+    "CANL22":False,
+    "CANL22_P":0,
+    "CANL22_L1_min":2,
+    "CANL22_L1_MAX":7,
+    "CANL22_L2":6,
+    "CANL22_check_busy":True,
+    "CANL22_fair_factor":4,
+    "CANL22_softer_fair":False,
+    "ideal_FIFO":False,
+}
+
+
+def protocol_params(proto):
+    if proto in PROTOCOLS:
+        return PROTOCOLS[proto]
+    if proto.startswith("CANL22_"):
+        lmin,lmax=proto[len("CANL22_"):].split("/")
+        return {"CANL22":True,"ideal_FIFO":False,"CANL22_L1_min":int(lmin),"CANL22_L1_MAX":int(lmax)}
+    raise ValueError("unknown protocol {0}".format(proto))
+
+
+# seed of a run (a SeedSequence child, as taken by lorasim3): from the seed of the sweep and the params of the run only
+def run_seed(sweep_seed,run_params):
+    digest=hashlib.sha256(json.dumps(run_cache.normalize(run_params),sort_keys=True).encode()).digest()
+    return {"entropy":sweep_seed,"spawn_key":[0]+[int.from_bytes(digest[i:i+4],"little") for i in range(0,16,4)]}
+
+
+# seed of the topology of a repetition (as taken by topo_builder)
+def topo_seed(sweep_seed,repe):
+    return {"entropy":sweep_seed,"spawn_key":[1,repe]}
+
+
+# build the matrices of the runs, once per topology (for the most devices of its runs), and give their paths to the runs
+def publish_matrices(runs,topos,matrices_dir):
+    if not os.path.exists(matrices_dir):
+        os.makedirs(matrices_dir)
+    n_nodes={}
+    for params in runs:
+        n_nodes[params["topo"]]=max(n_nodes.get(params["topo"],0),params["nrNodes"])
+    published={}
+    for topo_id in n_nodes:
+        distance_matrix,log_distance_matrix=lorasim3.build_path_loss_matrices(topos[topo_id],n_nodes[topo_id])
+        published[topo_id]={
+            "distance":os.path.join(matrices_dir,"{0}_distance.npy".format(topo_id)),
+            "log_distance":os.path.join(matrices_dir,"{0}_log_distance.npy".format(topo_id)),
+            }
+        np.save(published[topo_id]["distance"],distance_matrix)
+        np.save(published[topo_id]["log_distance"],log_distance_matrix)
+    for params in runs:
+        params["matrices"]=published[params["topo"]]
+    return published
+
+
+# a run, in a worker process
+def simulate(params):
+    return lorasim3.main_with_params(params)
+
+
+# the lorasim3 params of each run of a sweep, with its labels (see results_store.sweep_params)
+def sweep_runs(config,start_time,base_params=BASE_PARAMS):
+    runs=[]
+    for labels in results_store.sweep_params(config):
+        params=dict(base_params)
+        params.update({
+            "start_time":start_time,
+            "experiment":config["experiment"],
+            "var_CAD_prob":config["var_CAD_prob"],
+            "CAD_prob":config["fixed_CAD_prob"],
+            "full_distances":config["full_distances"],
+            "log_events":config["log_events"],
+            })
+        if "normalPayloadSize" in config:
+            params["normalPayloadSize"]=config["normalPayloadSize"]
+        params.update({name:value for name,value in labels.items() if name!="proto"})
+        params.update(protocol_params(labels["proto"]))
+        if "seed" in config:
+            # with common random numbers, the protocols of a cell share their seed (hence traffic and channel)
+            if "crn" in config and config["crn"]:
+                params["crn"]=True
+                params["seed"]=run_seed(config["seed"],{name:value for name,value in labels.items() if name!="proto"})
+            else:
+                params["seed"]=run_seed(config["seed"],labels)
+        runs.append((params,labels))
+    return runs
+
+
+# run a sweep, returns the store directory
+## topos: topologies to reuse (e.g. of a former sweep, loaded from its _topos.dat), built otherwise
+## cache_dir: a run cache (None to always simulate), cache_salt: its invalidation key (None: the simulator code)
+## workers: number of processes running the simulations (runs are stored in the sweep order anyway)
+def run_sweep(config,start_time=None,base_params=BASE_PARAMS,topos=None,cache_dir="results/cache",cache_salt=None,workers=1):
+    if start_time is None:
+        start_time=time.strftime("%Y-%m-%d-%H-%M-%S", time.localtime())
+
+    if topos is None:
+        topos={}
+        for repe in range(config["n_repes"]):
+            topos[repe]=topo_builder.build_topo(max(config["n_Nodes_tab"]),config["experiment"],config["maxDist_dev_gw"],
+                seed=topo_seed(config["seed"],repe) if "seed" in config else None,
+                nested_counts=config["n_Nodes_tab"] if "nested_topos" in config and config["nested_topos"] else None)
+    with open('results/{0}_config.dat'.format(start_time), 'wb') as config_file:
+        pickle.dump(config, config_file)
+    with open('results/{0}_topos.dat'.format(start_time), 'wb') as topos_file:
+        pickle.dump(topos, topos_file)
+
+    cache=run_cache.RunCache(cache_dir,cache_salt) if cache_dir is not None else None
+    store=results_store.ResultsStore('results/{0}_store'.format(start_time))
+    runs=sweep_runs(config,start_time,base_params)
+    # one trace per run, named after its index in the store (workers would otherwise replace each other's trace)
+    for i,(params,labels) in enumerate(runs):
+        if params["log_events"]:
+            params["trace_dir"]='results/{0}_trace/run_{1:05d}'.format(start_time,store.n_runs+i)
+    keys=[cache.key(params,topos[params["topo"]]) if cache is not None else None for params,labels in runs]
+    cached=[cache.get(key) if cache is not None else None for key in keys]
+    n_cached=sum(res is not None for res in cached)
+
+    to_simulate=[params for (params,labels),res in zip(runs,cached) if res is None]
+    matrices_dir='results/{0}_matrices'.format(start_time)
+    pool=None
+    # the workers and the published matrices do not outlive the sweep, even if a run fails
+    try:
+        publish_matrices(to_simulate,topos,matrices_dir)
+        if workers>1:
+            pool=multiprocessing.Pool(workers)
+            simulated=pool.imap(simulate,to_simulate)
+        else:
+            simulated=map(simulate,to_simulate)
+
+        # in the sweep order
+        for (params,labels),key,res in zip(runs,keys,cached):
+            if res is None:
+                res=next(simulated)
+                if cache is not None:
+                    cache.put(key,res)
+            store.append(res,labels)
+        store.close()
+    finally:
+        if pool is not None:
+            pool.terminate() # every result has been read, unless a run failed
+            pool.join()
+        shutil.rmtree(matrices_dir,ignore_errors=True)
+
+    sys.stdout=lorasim3.stdout_print_target
+    print("{0}: {1} runs, {2} from the cache".format(start_time,store.n_runs,n_cached))
+    return 'results/{0}_store'.format(start_time)
+
+
+if __name__ == '__main__':
+
+    config={
+        "n_repes":2,
+        "tpkts":[1500000],
+        "n_Nodes_tab":[100],
+        "scales":[1],
+        "CANL_lmins":[2],
+        "CANL_lmaxes":[7],
+        "n_retries":[40],
+        "experiment":4,
+        "var_CAD_prob":True,
+        "fixed_CAD_prob":100,
+        "full_distances":True,
+        "log_events":False,
+        "protos":["CANL22","CAD+Backoff"],
+        "timeline_tuples":[],
+        "maxDist_dev_gw":0,
+        "pl_sizes":[(40,100)],
+        "rayleigh_means":[4],
+        "gamma_EDs":[3],
+        "seed":1,
+        "crn":False,
+        "nested_topos":True,
+    }
+
+    run_sweep(config,workers=multiprocessing.cpu_count())
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+######################### Tests of the LoRaSim3 Simulator ####################################
+######################### https://github.com/Guillaumegaillard/CANL-LoRa #####################
+######################### unguaranteed public version ########################################
+
+# The simulator modules import each other from the simulator directory
+## python -m pytest -q simulator/tests
+
+import os
+import sys
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+######################### Tests of the LoRaSim3 Simulator ####################################
+######################### https://github.com/Guillaumegaillard/CANL-LoRa #####################
+######################### unguaranteed public version ########################################
+
+import numpy as np
+
+import aggregate
+import results_store
+
+
+def fake_res(der,latency,energy):
+    return {"TOTAL":{"DER":der,"PDR":der,"mean_success_latency":latency,"energy_per_success":energy},"settings":{},"nodes":{0:{}}}
+
+
+def test_no_value_runs_left_out(tmp_path):
+    store_dir=str(tmp_path/"store")
+    store=results_store.ResultsStore(store_dir,chunk_size=2)
+    store.append(fake_res(.5,100.,2.),{"proto":"ALOHA","repe":0})
+    store.append(fake_res(.7,300.,4.),{"proto":"ALOHA","repe":1})
+    # no success: the ratios over successes are -1
+    store.append(fake_res(0.,-1,-1),{"proto":"ALOHA","repe":2})
+    store.append(fake_res(.9,200.,3.),{"proto":"CANL22","repe":0})
+    store.close()
+
+    table=aggregate.aggregate(store_dir,group_by=["proto"])
+    aloha,canl=table[table["proto"]=="ALOHA"][0],table[table["proto"]=="CANL22"][0]
+    assert aloha["DER_n"]==3 and np.isclose(aloha["DER_mean"],.4)
+    assert aloha["mean_success_latency_n"]==2 and np.isclose(aloha["mean_success_latency_mean"],200.)
+    assert aloha["energy_per_success_n"]==2 and np.isclose(aloha["energy_per_success_mean"],3.)
+    assert np.isclose(aloha["energy_per_success_std"],np.sqrt(2.))
+    assert canl["energy_per_success_n"]==1 and np.isnan(canl["energy_per_success_ci"])
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+######################### Tests of the LoRaSim3 Simulator ####################################
+######################### https://github.com/Guillaumegaillard/CANL-LoRa #####################
+######################### unguaranteed public version ########################################
+
+import numpy as np
+
+import event_trace
+
+
+# a trace of small shards: node 0 transmits over [100,900], node 1 over [150,200] then listens over [300,1000],
+# the gateway hears node 0 at 900
+def write_trace(trace_dir):
+    trace=event_trace.EventTrace(trace_dir,"test",buffer_size=2,n_nodes=2)
+    trace.record(100.,0,event_trace.TX_START)
+    trace.record(150.,1,event_trace.TX_START)
+    trace.record(200.,1,event_trace.TX_STOP)
+    trace.record(300.,1,event_trace.LIS1_START)
+    trace.record(400.,1,event_trace.CAD_START)
+    trace.record(410.,1,event_trace.CAD_NEG)
+    trace.record(900.,0,event_trace.TX_STOP)
+    trace.record(900.,event_trace.GW_ID,event_trace.RX,0)
+    trace.record(1000.,1,event_trace.LIS1_STOP)
+    trace.close()
+
+
+def test_window_inside_one_tx(tmp_path):
+    trace_dir=str(tmp_path/"trace")
+    write_trace(trace_dir)
+    assert len(event_trace.load_index(trace_dir))==5
+
+    # no record within the window: the TX of node 0 and the listening of node 1 are open at its start
+    timeline=event_trace.extract_timeline(trace_dir,500.,600.)
+    assert sorted(timeline)==[0,1]
+    np.testing.assert_array_equal(timeline[0]["TX"],[[500.,600.]])
+    np.testing.assert_array_equal(timeline[1]["listen"],[[500.,600.]])
+    assert len(timeline[1]["TX"])==0 and len(timeline[1]["CAD"])==0
+
+    timeline=event_trace.extract_timeline(trace_dir,500.,950.,nodes=[0])
+    assert sorted(timeline)==[0]
+    np.testing.assert_array_equal(timeline[0]["TX"],[[500.,900.]])
+
+
+def test_closed_intervals_before_the_window(tmp_path):
+    trace_dir=str(tmp_path/"trace")
+    write_trace(trace_dir)
+    timeline=event_trace.extract_timeline(trace_dir,120.,420.)
+    np.testing.assert_array_equal(timeline[0]["TX"],[[120.,420.]])
+    np.testing.assert_array_equal(timeline[1]["TX"],[[150.,200.]])
+    np.testing.assert_array_equal(timeline[1]["listen"],[[300.,420.]])
+    np.testing.assert_array_equal(timeline[1]["CAD"],[[400.,410.]])
+    # node 1 is idle after 1000
+    assert event_trace.extract_timeline(trace_dir,1100.,1200.)=={}
+
+
+def test_new_trace_in_a_former_trace_dir(tmp_path):
+    trace_dir=str(tmp_path/"trace")
+    write_trace(trace_dir)
+    trace=event_trace.EventTrace(trace_dir,"test 2",n_nodes=2)
+    assert len(event_trace.load_index(trace_dir))==0
+    assert event_trace.read_trace(trace_dir)==[]
+    trace.record(10.,1,event_trace.TX_START)
+    trace.close()
+    assert event_trace.read_trace(trace_dir)==[(1,"TX_start",10.)]
+    assert len(event_trace.load_index(trace_dir))==1
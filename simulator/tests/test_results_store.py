@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+######################### Tests of the LoRaSim3 Simulator ####################################
+######################### https://github.com/Guillaumegaillard/CANL-LoRa #####################
+######################### unguaranteed public version ########################################
+
+import numpy as np
+
+import results_store
+
+
+# a res dict as main_with_params returns it, nodes.sent_rts_packets being written by CANL22 only
+def fake_res(proto,n_nodes,der):
+    nodes={}
+    for nodeid in range(n_nodes):
+        nodes[nodeid]={"DER":der+nodeid}
+        if proto=="CANL22":
+            nodes[nodeid]["sent_rts_packets"]=nodeid
+    res={"TOTAL":{"DER":der,"Global_TT_IGTs":list(range(n_nodes))},"settings":{"proto":proto},"nodes":nodes}
+    if proto=="CANL22":
+        res["TOTAL"]["rts_ratio"]=.5
+        res["TOTAL"]["rts_IGTs"]=[1,2]
+    return res
+
+
+# two chunks of different column sets: ALOHA runs, then CANL22 runs
+def write_store(store_dir):
+    store=results_store.ResultsStore(store_dir,chunk_size=2)
+    store.append(fake_res("ALOHA",2,.1),{"proto":"ALOHA"})
+    store.append(fake_res("ALOHA",3,.2),{"proto":"ALOHA"})
+    store.append(fake_res("CANL22",2,.3),{"proto":"CANL22"})
+    store.append(fake_res("CANL22",1,.4),{"proto":"CANL22"})
+    store.close()
+
+
+def test_columns_missing_from_some_chunks(tmp_path):
+    store_dir=str(tmp_path/"store")
+    write_store(store_dir)
+    columns=results_store.read_columns(store_dir,["TOTAL.DER","TOTAL.rts_ratio","TOTAL.rts_IGTs","nodes.sent_rts_packets","nodes.id"])
+
+    np.testing.assert_array_equal(columns["TOTAL.DER"],[.1,.2,.3,.4])
+    np.testing.assert_array_equal(columns["TOTAL.rts_ratio"],[np.nan,np.nan,.5,.5])
+    assert columns["TOTAL.rts_IGTs"]==[None,None,[1,2],[1,2]]
+    values,offsets=columns["nodes.sent_rts_packets"]
+    np.testing.assert_array_equal(values,[np.nan]*5+[0,1,0])
+    np.testing.assert_array_equal(offsets,[0,2,5,7,8])
+    np.testing.assert_array_equal(columns["nodes.id"][0],[0,1,0,1,2,0,1,0])
+
+    # a selection within the chunks of one column set
+    columns=results_store.read_columns(store_dir,["TOTAL.rts_ratio","nodes.sent_rts_packets"],runs=[1])
+    np.testing.assert_array_equal(columns["TOTAL.rts_ratio"],[np.nan])
+    np.testing.assert_array_equal(columns["nodes.sent_rts_packets"][0],[np.nan]*3)
+
+
+def test_unknown_column(tmp_path):
+    store_dir=str(tmp_path/"store")
+    write_store(store_dir)
+    try:
+        results_store.read_columns(store_dir,["TOTAL.no_such_key"])
+    except KeyError:
+        return
+    assert False
+
+
+def test_runs_of_chunks_of_different_columns(tmp_path):
+    store_dir=str(tmp_path/"store")
+    write_store(store_dir)
+    aloha=results_store.read_run(store_dir,1)
+    canl=results_store.read_run(store_dir,2)
+    assert "rts_ratio" not in aloha["TOTAL"] and "sent_rts_packets" not in aloha["nodes"][0]
+    assert canl["TOTAL"]["rts_ratio"]==.5 and canl["nodes"][1]["sent_rts_packets"]==1
+    assert aloha["TOTAL"]["Global_TT_IGTs"]==[0,1,2]
@@ -8,9 +8,15 @@ import numpy as np
 import math
 import constants
 import sys
+import os
+import pickle
 
 rng = np.random.default_rng()
 
+# topology files (dicts of topologies, as results/<start_time>_topos.dat) loaded in this process,
+# by path, with the size and date of the file they were loaded from
+loaded_topos={}
+
 # A switch for further computations
 lora24GHz = False
 
@@ -20,9 +26,21 @@ lora24GHz = False
 ## a PHY layer setting *experiment*
 ## an optional maximum distance to the center, a GW, *static_maxDist*
 #### default is max. range of a noiseless GW-ED link
-def build_topo(nb_nodes,experiment,static_maxDist=0):
+## an optional *seed* (an int, or {"entropy":int,"spawn_key":[int,...]} for a numpy SeedSequence child) for a reproducible topology
+#### default draws from the module rng
+## optional *nested_counts*, numbers of devices (<= nb_nodes) of nested topologies: for each k of them, the first k devices
+## are a topology of k devices (as far as minimum inter distances go), to be used by runs of k devices (a node-density sweep)
+#### default only the whole topology (its prefixes are less spread)
+def build_topo(nb_nodes,experiment,static_maxDist=0,seed=None,nested_counts=None):
     topo={}
 
+    if seed is not None:
+        seed_seq=np.random.SeedSequence(seed["entropy"],spawn_key=seed["spawn_key"]) if isinstance(seed,dict) else np.random.SeedSequence(seed)
+        topo_rng=np.random.default_rng(seed_seq)
+        topo["seed"]={"entropy":seed_seq.entropy,"spawn_key":list(seed_seq.spawn_key)}
+    else:
+        topo_rng=rng
+
     # no max has been given
     if static_maxDist==0:
         if lora24GHz:
@@ -70,16 +88,26 @@ def build_topo(nb_nodes,experiment,static_maxDist=0):
 
     # devices get a minimum inter distance (no overlap)
     min_inter_dist=10/nb_nodes*20
+    # nested: a device gets the minimum inter distance of the smallest nested topology it belongs to
+    if nested_counts is not None:
+        nested_counts=sorted(set(nested_counts)|{nb_nodes})
+        if nested_counts[-1]>nb_nodes:
+            raise ValueError("nested topologies of up to {0} devices in a topology of {1}".format(nested_counts[-1],nb_nodes))
+        topo["nested_counts"]=nested_counts
+        node_min_inter_dists=[10/nested_counts[np.searchsorted(nested_counts,i+1)]*20 for i in range(nb_nodes)]
+    else:
+        node_min_inter_dists=[min_inter_dist]*nb_nodes
 
     nodes=[]
     for i in range(0,nb_nodes):
+        min_inter_dist=node_min_inter_dists[i]
         # this is a prodecure for placing nodes
         # and ensure minimum distance between each pair of nodes
         found = 0
         rounds = 0
         while (found == 0 and rounds < 100):
-            a = .99*rng.random()+0.01 #avoid log10(0)/dividebyzero
-            b = .99*rng.random()+0.01 #avoid log10(0)/dividebyzero
+            a = .99*topo_rng.random()+0.01 #avoid log10(0)/dividebyzero
+            b = .99*topo_rng.random()+0.01 #avoid log10(0)/dividebyzero
             if b<a:
                 a,b = b,a
             posx = b*maxDist*math.cos(2*math.pi*a/b)+bsx
@@ -115,6 +143,23 @@ def build_topo(nb_nodes,experiment,static_maxDist=0):
     return topo
 
 
+# the topologies of a file, loaded once per process (again if the file changed)
+def load_topos(path):
+    stat=os.stat(path)
+    if path not in loaded_topos or loaded_topos[path][0]!=(stat.st_size,stat.st_mtime_ns):
+        with open(path,'rb') as topos_file:
+            loaded_topos[path]=((stat.st_size,stat.st_mtime_ns),pickle.load(topos_file))
+    return loaded_topos[path][1]
+
+
+# the topology of a run: params["topo"] is either a topology dict itself,
+# or its index in results/<start_time>_topos.dat
+def get_topo(params):
+    if isinstance(params["topo"],dict):
+        return params["topo"]
+    return load_topos('results/{0}_topos.dat'.format(params["start_time"]))[params["topo"]]
+
+
 if __name__ == '__main__':
     nb_nodes=20
     experiment=4
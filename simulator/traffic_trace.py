@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+######################### Traffic traces for the LoRaSim3 Simulator ##########################
+######################### https://github.com/Guillaumegaillard/CANL-LoRa #####################
+######################### unguaranteed public version ########################################
+
+# A traffic trace gives, per node, the dates (ms, increasing) and payload sizes (B) of its generations.
+# Two file formats are accepted, both memory-mapped read-only (the OS shares the pages among workers):
+## .npz (uncompressed, as written by save_traffic_trace):
+####   "gen_times" float64 and "sizes" int, all nodes concatenated,
+####   "offsets" int of length n_nodes+1, node i owns [offsets[i],offsets[i+1])
+## .npy: a structured array with fields "node", "gen_time", "size", sorted by node then gen_time
+
+import numpy as np
+import zipfile
+import struct
+
+
+# traces already mapped in this process, by path
+loaded_traces={}
+
+
+# memory-map an array stored (not compressed) in a npz archive
+def memmap_npz_member(path,name):
+    with zipfile.ZipFile(path) as zf:
+        info=zf.getinfo(name+'.npy')
+        if info.compress_type!=zipfile.ZIP_STORED:
+            raise ValueError("{0}: {1} is compressed and can not be memory-mapped, use np.savez".format(path,name))
+
+    with open(path,'rb') as f:
+        # skip the local file header of the zip member
+        f.seek(info.header_offset)
+        local_header=f.read(30)
+        fname_len,extra_len=struct.unpack('<HH',local_header[26:30])
+        f.seek(info.header_offset+30+fname_len+extra_len)
+
+        # then the npy header
+        version=np.lib.format.read_magic(f)
+        if version==(1,0):
+            shape,fortran_order,dtype=np.lib.format.read_array_header_1_0(f)
+        else:
+            shape,fortran_order,dtype=np.lib.format.read_array_header_2_0(f)
+        data_offset=f.tell()
+
+    return np.memmap(path,dtype=dtype,mode='r',shape=shape,offset=data_offset,order='F' if fortran_order else 'C')
+
+
+# map a trace file, returns (gen_times, sizes, offsets)
+def load_traffic_trace(path):
+    if path in loaded_traces:
+        return loaded_traces[path]
+
+    if path.endswith('.npz'):
+        gen_times=memmap_npz_member(path,"gen_times")
+        sizes=memmap_npz_member(path,"sizes")
+        offsets=np.array(memmap_npz_member(path,"offsets"))
+    else:
+        trace=np.load(path,mmap_mode='r')
+        gen_times=trace["gen_time"]
+        sizes=trace["size"]
+        # nodes are sorted, find where each one starts
+        offsets=np.searchsorted(trace["node"],np.arange(trace["node"][-1]+2)) if len(trace)>0 else np.zeros(1,dtype=int)
+
+    loaded_traces[path]=(gen_times,sizes,offsets)
+    return loaded_traces[path]
+
+
+# read-only views on the generations of node *nodeid*
+def node_traffic(trace,nodeid):
+    gen_times,sizes,offsets=trace
+    if nodeid+1>=len(offsets):
+        return gen_times[:0],sizes[:0]
+    return gen_times[offsets[nodeid]:offsets[nodeid+1]],sizes[offsets[nodeid]:offsets[nodeid+1]]
+
+
+# write a npz trace from per node sequences of dates and sizes
+def save_traffic_trace(path,gen_times_per_node,sizes_per_node):
+    offsets=np.zeros(len(gen_times_per_node)+1,dtype=np.int64)
+    offsets[1:]=np.cumsum([len(gt) for gt in gen_times_per_node])
+    np.savez(path,
+        gen_times=np.concatenate(gen_times_per_node).astype(np.float64) if len(gen_times_per_node)>0 else np.zeros(0),
+        sizes=np.concatenate(sizes_per_node).astype(np.int64) if len(sizes_per_node)>0 else np.zeros(0,dtype=np.int64),
+        offsets=offsets,
+        )